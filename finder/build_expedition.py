@@ -1,38 +1,90 @@
 #!/usr/bin/env python3
 import argparse
 import csv
+import io
+import logging
+import os
 import textwrap
-from pathlib import Path
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
+from tqdm import tqdm
 from util.pylib import log
 
-from finder.pylib import sheet_util
+from finder.pylib import fit_bytes, sheet_util, storage
 
 
 def main():
     log.started()
     args = parse_args()
 
-    args.expedition_dir.mkdir(parents=True, exist_ok=True)
-    csv_path = args.expedition_dir / "manifest.csv"
+    sheets = storage.get_storage(args.sheet_dir)
+    names = sheets.list()
 
-    with csv_path.open("w") as csv_file:
+    workers = args.workers or os.cpu_count()
+
+    with (
+        sheets,
+        storage.get_storage(args.expedition_dir) as expedition,
+        ProcessPoolExecutor(workers) as executor,
+        io.StringIO() as csv_file,
+    ):
         writer = csv.writer(csv_file)
         writer.writerow(["Filename", "reduced_by"])
 
-        for sheet_path in sorted(args.sheet_dir.glob("*")):
-            writer.writerow([sheet_path.name, args.reduce_by])
-            sheet_image = sheet_util.get_sheet_image(sheet_path)
+        # Keep a bounded number of sheets in flight
+        jobs = deque()
+        for blob in tqdm(sheets.prefetch(names), total=len(names)):
+            future = executor.submit(
+                shrink_sheet, blob, args.reduce_by, args.max_bytes, args.min_quality
+            )
+            jobs.append((blob.name, future))
+            if len(jobs) >= 2 * workers:
+                save_sheet(expedition, writer, *jobs.popleft(), args.max_bytes)
 
-            if args.reduce_by > 1:
-                sheet_image = sheet_image.reduce(args.reduce_by)
+        while jobs:
+            save_sheet(expedition, writer, *jobs.popleft(), args.max_bytes)
 
-            exp_path = args.expedition_dir / sheet_path.name
-            sheet_image.save(str(exp_path))
+        expedition.write("manifest.csv", csv_file.getvalue().encode())
 
     log.finished()
 
 
+def shrink_sheet(blob, reduce_by, max_bytes, min_quality) -> fit_bytes.Fit | None:
+    sheet = sheet_util.get_lazy_sheet(blob)
+    if not sheet:
+        return None
+
+    image_format = storage.image_format(blob.name)
+
+    try:
+        if max_bytes:
+            return fit_bytes.fit_to_bytes(
+                sheet, image_format, max_bytes, reduce_by, min_quality=min_quality
+            )
+
+        image = sheet.read_reduced(reduce_by)
+        return fit_bytes.Fit(fit_bytes.encode_image(image, image_format), reduce_by)
+
+    except sheet_util.IMAGE_EXCEPTIONS as err:
+        msg = f"Could not shrink {blob.name}: {err}"
+        logging.exception(msg)
+        return None
+
+
+def save_sheet(expedition, writer, name, future, max_bytes):
+    fit = future.result()
+    if fit is None:
+        return
+
+    if max_bytes and len(fit.data) > max_bytes:
+        msg = f"Could not fit {name} into {max_bytes} bytes"
+        logging.warning(msg)
+
+    expedition.write(name, fit.data)
+    writer.writerow([name, fit.reduce_by])
+
+
 def parse_args():
     arg_parser = argparse.ArgumentParser(
         fromfile_prefix_chars="@",
@@ -44,18 +96,18 @@ def parse_args():
 
     arg_parser.add_argument(
         "--sheet-dir",
-        type=Path,
         metavar="PATH",
         required=True,
-        help="""The sheet images are in this directory.""",
+        help="""The sheet images are in this directory. This may also be a zip or
+            tar archive or an S3 URL like s3://bucket/prefix.""",
     )
 
     arg_parser.add_argument(
         "--expedition-dir",
         required=True,
-        type=Path,
         metavar="PATH",
-        help="""Place expedition files in this directory.""",
+        help="""Place expedition files in this directory, zip archive, or S3
+            URL.""",
     )
 
     arg_parser.add_argument(
@@ -63,7 +115,33 @@ def parse_args():
         type=int,
         default=1,
         metavar="N",
-        help="""Shrink images by this factor. (default: %(default)s)""",
+        help="""Shrink images by this factor. With --max-bytes this is the smallest
+            factor used. (default: %(default)s)""",
+    )
+
+    arg_parser.add_argument(
+        "--max-bytes",
+        type=int,
+        metavar="N",
+        help="""Shrink each image as little as possible, and compress it with the
+            highest quality possible, so that its file is at most this many bytes.
+            The reduction factor for each image is written to the manifest.""",
+    )
+
+    arg_parser.add_argument(
+        "--min-quality",
+        type=int,
+        default=60,
+        metavar="N",
+        help="""With --max-bytes, do not compress JPEG images with a quality below
+            this. (default: %(default)s)""",
+    )
+
+    arg_parser.add_argument(
+        "--workers",
+        type=int,
+        metavar="INT",
+        help="""Shrink images with this many processes. (default: all CPUs)""",
     )
 
     args = arg_parser.parse_args()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+import argparse
+import logging
+import textwrap
+from pathlib import Path
+
+from util.pylib import log
+
+from finder.pylib.catalog import Catalog
+
+
+def main():
+    log.started()
+    args = parse_args()
+
+    with Catalog(args.catalog) as catalog:
+        for sheet_dir in args.sheet_dir:
+            count = catalog.update(sheet_dir, args.workers)
+            msg = f"Cataloged {count} new or changed sheets in {sheet_dir}"
+            logging.info(msg)
+
+    log.finished()
+
+
+def parse_args():
+    arg_parser = argparse.ArgumentParser(
+        fromfile_prefix_chars="@",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=textwrap.dedent(
+            """
+            Build or update a catalog of herbarium sheets. The catalog holds each
+            sheet's path, image format, dimensions, file size, modification time, and a
+            hash of its contents. Other scripts use it to find sheets and their sizes
+            without opening the images.
+            """,
+        ),
+    )
+
+    arg_parser.add_argument(
+        "--sheet-dir",
+        type=Path,
+        metavar="PATH",
+        required=True,
+        action="append",
+        help="""The sheet images are in this directory. You may use this argument
+            more than once.""",
+    )
+
+    arg_parser.add_argument(
+        "--catalog",
+        type=Path,
+        metavar="PATH",
+        required=True,
+        help="""The SQLite catalog database.""",
+    )
+
+    arg_parser.add_argument(
+        "--workers",
+        type=int,
+        metavar="INT",
+        help="""Read image headers with this many processes. (default: all CPUs)""",
+    )
+
+    args = arg_parser.parse_args()
+    return args
+
+
+if __name__ == "__main__":
+    main()
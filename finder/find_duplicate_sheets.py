@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+import argparse
+import csv
+import logging
+import textwrap
+from pathlib import Path
+
+from util.pylib import log
+
+from finder.pylib import dedup
+
+
+def main():
+    log.started()
+    args = parse_args()
+
+    paths = sorted(p for p in args.sheet_dir.glob("*") if p.is_file())
+
+    hashes = dedup.hash_sheets(paths, args.hash_index, args.workers)
+    clusters = dedup.find_duplicates(hashes, args.max_distance)
+
+    with args.duplicate_csv.open("w") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["path", "representative"])
+        for path, representative in clusters.items():
+            writer.writerow([path, representative])
+
+    dupes = sum(1 for k, v in clusters.items() if k != v)
+    msg = f"Number of herbarium sheets = {len(clusters)} Duplicates = {dupes}"
+    logging.info(msg)
+
+    log.finished()
+
+
+def parse_args():
+    arg_parser = argparse.ArgumentParser(
+        fromfile_prefix_chars="@",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=textwrap.dedent(
+            """
+            Find exact and near duplicate herbarium sheets so that we only send one
+            sheet per cluster of duplicates to the YOLO model. The output CSV maps
+            every sheet to its cluster's representative sheet.
+            """,
+        ),
+    )
+
+    arg_parser.add_argument(
+        "--sheet-dir",
+        type=Path,
+        metavar="PATH",
+        required=True,
+        help="""The sheet images are in this directory.""",
+    )
+
+    arg_parser.add_argument(
+        "--duplicate-csv",
+        type=Path,
+        metavar="PATH",
+        required=True,
+        help="""Output the sheet paths and their representative sheet to this CSV.""",
+    )
+
+    arg_parser.add_argument(
+        "--hash-index",
+        type=Path,
+        metavar="PATH",
+        help="""Keep sheet hashes in this CSV file so that later runs only hash new
+            or changed sheets.""",
+    )
+
+    arg_parser.add_argument(
+        "--max-distance",
+        type=int,
+        default=10,
+        metavar="INT",
+        help="""Sheets are duplicates when their hashes differ by at most this many
+            bits out of 256. (default: %(default)s)""",
+    )
+
+    arg_parser.add_argument(
+        "--workers",
+        type=int,
+        metavar="INT",
+        help="""Hash the sheets with this many processes. (default: all CPUs)""",
+    )
+
+    args = arg_parser.parse_args()
+    return args
+
+
+if __name__ == "__main__":
+    main()
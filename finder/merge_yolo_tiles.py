@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+import argparse
+import logging
+import textwrap
+from pathlib import Path
+
+import numpy as np
+from tqdm import tqdm
+from util.pylib import log
+
+from finder.pylib import storage, tiling
+
+
+def main():
+    log.started()
+    args = parse_args()
+
+    tiles = tiling.read_index(args.tile_index)
+
+    sheets = tiling.read_tile_results(tiles, args.yolo_results_dir)
+
+    msg = f"Merging YOLO results from {len(tiles)} tiles on {len(sheets)} sheets"
+    logging.info(msg)
+
+    sizes = {t["sheet"]: (t["width"], t["height"]) for t in tiles.values()}
+
+    args.merged_dir.mkdir(parents=True, exist_ok=True)
+
+    for sheet, found in tqdm(sheets.items()):
+        classes, boxes, confs, regions = zip(*found, strict=True)
+        boxes, classes, confs = tiling.merge_tile_boxes(
+            np.array(boxes),
+            np.array(classes),
+            np.array(confs),
+            np.array(regions),
+            args.iou_threshold,
+        )
+
+        path = args.merged_dir / f"{storage.stem(sheet)}.txt"
+        with path.open("w") as out:
+            for box, cls, conf in zip(boxes, classes, confs, strict=True):
+                out.write(tiling.to_yolo_format(box, cls, conf, *sizes[sheet]))
+
+    log.finished()
+
+
+def parse_args():
+    arg_parser = argparse.ArgumentParser(
+        fromfile_prefix_chars="@",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=textwrap.dedent(
+            """
+            Put the YOLO results for sheet tiles back together. The boxes are moved
+            from tile to sheet coordinates, and the duplicate boxes where the tiles
+            overlap are merged. The output has one YOLO results file per sheet, so
+            it can be used by yolo-results-to-labels.
+            """,
+        ),
+    )
+
+    arg_parser.add_argument(
+        "--tile-index",
+        type=Path,
+        metavar="PATH",
+        required=True,
+        help="""The tile index CSV written by yolo-inference --tile-index.""",
+    )
+
+    arg_parser.add_argument(
+        "--yolo-results-dir",
+        type=Path,
+        metavar="PATH",
+        required=True,
+        help="""Directory containing the label predictions for the tiles.""",
+    )
+
+    arg_parser.add_argument(
+        "--merged-dir",
+        type=Path,
+        metavar="PATH",
+        required=True,
+        help="""Write the label predictions for the whole sheets to this
+            directory.""",
+    )
+
+    arg_parser.add_argument(
+        "--iou-threshold",
+        type=float,
+        default=0.5,
+        help="""After the pieces of labels cut by tile edges are joined, merge
+            boxes when their IoU is at least this value. (default: %(default)s)""",
+    )
+
+    args = arg_parser.parse_args()
+    return args
+
+
+if __name__ == "__main__":
+    main()
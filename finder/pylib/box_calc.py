@@ -65,8 +65,9 @@ def find_box_groups(boxes: npt.NDArray, threshold: float = 0.8) -> npt.ArrayLike
         # Every time we find new matches we need to check the new ones against the rest
         while found:
             found = False
+            end = len(curr)  # Boxes found in this pass are searched in the next one
 
-            for c in curr[start:]:
+            for c in curr[start:end]:
                 # Get interior (overlap) coordinates
                 xx0 = np.maximum(x0[c], x0[idx])
                 yy0 = np.maximum(y0[c], y0[idx])
@@ -83,8 +84,93 @@ def find_box_groups(boxes: npt.NDArray, threshold: float = 0.8) -> npt.ArrayLike
                 if len(iou_):
                     found = True
                     overlapping[idx[iou_]] = group  # Mark the found boxes
-                    start = len(curr)  # Skip already searched boxes
                     curr = np.hstack((curr, idx[iou_]))  # Append to current indexes
                     idx = np.delete(idx, iou_)  # Remove all matching indexes
 
+            start = end  # Skip already searched boxes
+
     return overlapping
+
+
+def box_overlaps(boxes: npt.NDArray) -> tuple[npt.NDArray, npt.NDArray, npt.NDArray]:
+    """
+    Get the IoU of every pair of intersecting boxes.
+
+    Args:
+    ----
+        boxes: A 2D array of box coordinates shaped like np.array(N, 4).
+            Each box is given in left, top, right, bottom order.
+
+    Returns:
+    -------
+        Three 1D arrays: the index of the first box in the pair, the index of the
+        second box, and their IoU. Pairs that do not intersect are left out.
+    """
+    boxes = boxes.astype("float64")
+
+    x0, y0, x1, y1 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+
+    area = np.maximum(0.0, x1 - x0) * np.maximum(0.0, y1 - y0)
+
+    i, j = np.triu_indices(len(boxes), k=1)
+
+    inter = np.maximum(0.0, np.minimum(x1[i], x1[j]) - np.maximum(x0[i], x0[j]))
+    inter *= np.maximum(0.0, np.minimum(y1[i], y1[j]) - np.maximum(y0[i], y0[j]))
+
+    keep = inter > 0.0
+    i, j, inter = i[keep], j[keep], inter[keep]
+
+    return i, j, inter / (area[j] + area[i] - inter)
+
+
+def find_box_groups_sweep(
+    boxes: npt.NDArray, thresholds: list[float]
+) -> dict[float, npt.NDArray]:
+    """
+    Find overlapping sets of bounding boxes for several thresholds at once.
+
+    The pairwise overlaps are only calculated once. The groups for a threshold are
+    the connected boxes when we only keep the pairs with an IoU >= the threshold.
+    So we add pairs from the highest IoU to the lowest, and take a snapshot of the
+    groups every time we pass a threshold.
+
+    The groups are numbered the same way as find_box_groups() numbers them.
+    """
+    if len(boxes) == 0:
+        return {t: np.array([]) for t in thresholds}
+
+    if boxes.dtype.kind == "i":
+        boxes = boxes.astype("float64")
+
+    area = np.maximum(0.0, boxes[:, 2] - boxes[:, 0])
+    area *= np.maximum(0.0, boxes[:, 3] - boxes[:, 1])
+
+    # find_box_groups() starts each new group with the largest remaining box
+    seeds = area.argsort()[::-1]
+
+    first, second, iou = box_overlaps(boxes)
+    order = np.argsort(-iou, kind="stable")
+
+    parent = list(range(len(boxes)))
+
+    def root(box):
+        while parent[box] != box:
+            parent[box] = parent[parent[box]]
+            box = parent[box]
+        return box
+
+    groups = {}
+    edge = 0
+    for threshold in sorted(thresholds, reverse=True):
+        while edge < len(order) and iou[order[edge]] >= threshold:
+            a, b = root(first[order[edge]]), root(second[order[edge]])
+            parent[max(a, b)] = min(a, b)
+            edge += 1
+
+        numbers = {}
+        for box in seeds:
+            numbers.setdefault(root(box), len(numbers) + 1)
+
+        groups[threshold] = np.array([numbers[root(b)] for b in range(len(boxes))])
+
+    return groups
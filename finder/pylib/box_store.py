@@ -0,0 +1,175 @@
+from collections.abc import Iterator
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from finder.pylib import const
+
+
+class BoxStore:
+    """
+    Label boxes for many sheets kept in a few flat arrays.
+
+    The boxes of sheet i are boxes[offsets[i] : offsets[i + 1]], and their classes
+    are codes from const.CLASS2INT in the same slice of classes. A sheet's boxes and
+    classes are views into the flat arrays, so getting them is cheap.
+    """
+
+    def __init__(
+        self,
+        sheets: list[str],
+        offsets: npt.NDArray[np.int64],
+        boxes: npt.NDArray[np.int32],
+        classes: npt.NDArray[np.int8],
+    ):
+        self.sheets = sheets
+        self.offsets = offsets
+        self.boxes = boxes
+        self.classes = classes
+        self._index = None
+
+    def __len__(self) -> int:
+        return len(self.sheets)
+
+    def __getitem__(self, i) -> tuple[npt.NDArray, npt.NDArray]:
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.boxes[start:end], self.classes[start:end]
+
+    def __contains__(self, sheet_id) -> bool:
+        return sheet_id in self.index
+
+    @property
+    def index(self) -> dict[str, int]:
+        if self._index is None:
+            self._index = {s: i for i, s in enumerate(self.sheets)}
+        return self._index
+
+    def get(self, sheet_id) -> tuple[npt.NDArray, npt.NDArray]:
+        return self[self.index[sheet_id]]
+
+    def items(self) -> Iterator[tuple[str, npt.NDArray, npt.NDArray]]:
+        for i, sheet_id in enumerate(self.sheets):
+            yield sheet_id, *self[i]
+
+    def head(self, count) -> "BoxStore":
+        """Get a store with only the first count sheets."""
+        end = self.offsets[count]
+        return BoxStore(
+            self.sheets[:count],
+            self.offsets[: count + 1],
+            self.boxes[:end],
+            self.classes[:end],
+        )
+
+    def to_arrow(self) -> pa.Table:
+        """Get a table with one row per box, sorted by sheet."""
+        counts = np.diff(self.offsets)
+        sheet = pa.DictionaryArray.from_arrays(
+            pa.array(np.repeat(np.arange(len(self), dtype=np.int32), counts)),
+            pa.array(self.sheets, type=pa.string()),
+        )
+        box = pa.FixedSizeListArray.from_arrays(
+            pa.array(self.boxes.reshape(-1), type=pa.int32()), 4
+        )
+        return pa.table({"sheet": sheet, "box": box, "class": self.classes})
+
+    @classmethod
+    def from_arrow(cls, table: pa.Table) -> "BoxStore":
+        """Build a store from a table. This does not copy memory mapped columns."""
+        table = table.combine_chunks()
+
+        if table.num_rows == 0:
+            return empty_store()
+
+        sheet = table.column("sheet").chunk(0)
+        sheets = sheet.dictionary.to_pylist()
+        indices = sheet.indices.to_numpy()
+
+        boxes = table.column("box").chunk(0).flatten().to_numpy().reshape(-1, 4)
+        classes = table.column("class").chunk(0).to_numpy()
+
+        offsets = np.zeros(len(sheets) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(indices, minlength=len(sheets)), out=offsets[1:])
+
+        return cls(sheets, offsets, boxes, classes)
+
+    def save(self, path) -> None:
+        """Save to a Parquet file, or to an Arrow IPC file that can be memory mapped."""
+        path = Path(path)
+        table = self.to_arrow()
+        if path.suffix == ".parquet":
+            pq.write_table(table, path)
+        else:
+            with pa.OSFile(str(path), "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+
+    @classmethod
+    def load(cls, path) -> "BoxStore":
+        """Load a Parquet file, or memory map an Arrow IPC file."""
+        path = Path(path)
+        if path.suffix == ".parquet":
+            return cls.from_arrow(pq.read_table(path))
+        source = pa.memory_map(str(path))
+        return cls.from_arrow(pa.ipc.open_file(source).read_all())
+
+
+class BoxStoreBuilder:
+    """Collect boxes for sheets in any order and pack them into a BoxStore."""
+
+    def __init__(self):
+        self.index = {}
+        self.sheet_ids = []  # Sheet index for every chunk of boxes
+        self.boxes = []
+        self.classes = []
+
+    def add_sheet(self, sheet_id) -> int:
+        """Make sure a sheet is in the store even if it never gets any boxes."""
+        return self.index.setdefault(sheet_id, len(self.index))
+
+    def add(self, sheet_id, boxes, classes) -> None:
+        """Add boxes and their class names or class codes to a sheet."""
+        i = self.add_sheet(sheet_id)
+        if len(boxes) == 0:
+            return
+        classes = np.asarray(classes)
+        if classes.dtype.kind in "UO":
+            classes = np.array([const.CLASS2INT[c] for c in classes])
+        self.sheet_ids.append(np.full(len(boxes), i, dtype=np.int32))
+        self.boxes.append(np.rint(np.asarray(boxes, dtype=np.float64)))
+        self.classes.append(classes)
+
+    def build(self) -> BoxStore:
+        if not self.boxes:
+            store = empty_store()
+            return BoxStore(
+                list(self.index),
+                np.zeros(len(self.index) + 1, dtype=np.int64),
+                store.boxes,
+                store.classes,
+            )
+
+        sheet_ids = np.concatenate(self.sheet_ids)
+        order = np.argsort(sheet_ids, kind="stable")  # Keep each sheet's box order
+
+        offsets = np.zeros(len(self.index) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sheet_ids, minlength=len(self.index)), out=offsets[1:])
+
+        return BoxStore(
+            list(self.index),
+            offsets,
+            np.concatenate(self.boxes)[order].astype(np.int32),
+            np.concatenate(self.classes)[order].astype(np.int8),
+        )
+
+
+def empty_store() -> BoxStore:
+    return BoxStore(
+        [],
+        np.zeros(1, dtype=np.int64),
+        np.empty((0, 4), dtype=np.int32),
+        np.empty(0, dtype=np.int8),
+    )
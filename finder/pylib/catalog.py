@@ -0,0 +1,164 @@
+import hashlib
+import logging
+import sqlite3
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from PIL import Image
+
+from finder.pylib import sheet_util
+
+HASH_BLOCK = 1024 * 1024
+
+SCHEMA = """
+    create table if not exists sheets (
+        path     text primary key,
+        dir      text not null,
+        stem     text not null,
+        format   text,
+        width    integer,
+        height   integer,
+        bytes    integer not null,
+        mtime_ns integer not null,
+        sha256   text not null
+    );
+    create index if not exists sheets_stem on sheets (stem);
+    create index if not exists sheets_dir on sheets (dir);
+    """
+
+
+@dataclass
+class SheetInfo:
+    path: str
+    dir: str
+    stem: str
+    format: str | None
+    width: int | None
+    height: int | None
+    bytes: int
+    mtime_ns: int
+    sha256: str
+
+    @property
+    def name(self) -> str:
+        return Path(self.path).name
+
+    @property
+    def size(self) -> tuple[int, int] | None:
+        return None if self.width is None else (self.width, self.height)
+
+
+class Catalog:
+    """
+    A SQLite catalog of sheet images.
+
+    Sheet sizes come from the image headers so we know them without decoding. The
+    catalog is updated incrementally, only new or changed files are read.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db = sqlite3.connect(self.db_path)
+        self.db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self) -> None:
+        self.db.close()
+
+    def update(self, sheet_dir, workers=None) -> int:
+        """Catalog the sheets in a directory and return how many were (re)read."""
+        sheet_dir = Path(sheet_dir).resolve()
+        old = {s.path: (s.bytes, s.mtime_ns) for s in self.sheets(sheet_dir)}
+
+        changed, current = [], set()
+        for path in sheet_dir.glob("*"):
+            try:
+                if not path.is_file():
+                    continue
+                stat = path.stat()
+            except OSError as err:
+                msg = f"Could not read {path.name}: {err}"
+                logging.warning(msg)
+                continue
+            current.add(str(path))
+            if old.get(str(path)) != (stat.st_size, stat.st_mtime_ns):
+                changed.append(path)
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            infos = executor.map(read_header, changed, chunksize=16)
+            infos = [i for i in infos if i is not None]
+
+        with self.db:
+            self.db.executemany(
+                "delete from sheets where path = ?",
+                [(p,) for p in old if p not in current],
+            )
+            self.db.executemany(
+                "insert or replace into sheets values (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [tuple(vars(i).values()) for i in infos],
+            )
+
+        return len(infos)
+
+    def sheets(self, sheet_dir=None) -> list[SheetInfo]:
+        if sheet_dir is None:
+            rows = self.db.execute("select * from sheets order by path")
+        else:
+            rows = self.db.execute(
+                "select * from sheets where dir = ? order by path",
+                (str(Path(sheet_dir).resolve()),),
+            )
+        return [SheetInfo(*r) for r in rows]
+
+    def by_stem(self, stem) -> SheetInfo | None:
+        row = self.db.execute(
+            "select * from sheets where stem = ? order by path", (stem,)
+        ).fetchone()
+        return SheetInfo(*row) if row else None
+
+    def stems(self, sheet_dir=None) -> dict[str, SheetInfo]:
+        return {s.stem: s for s in self.sheets(sheet_dir)}
+
+
+def read_header(path) -> SheetInfo | None:
+    """Get the sheet's size without decoding it, and a hash of its contents."""
+    try:
+        stat = path.stat()
+        digest = hashlib.sha256()
+        with path.open("rb") as in_file:
+            while block := in_file.read(HASH_BLOCK):
+                digest.update(block)
+    except OSError as err:
+        msg = f"Could not read {path.name}: {err}"
+        logging.warning(msg)
+        return None
+
+    format_ = width = height = None
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", category=UserWarning)  # No EXIF warnings
+        try:
+            with Image.open(path) as image:
+                format_ = image.format
+                width, height = image.size
+        except sheet_util.IMAGE_EXCEPTIONS as err:
+            msg = f"Could not read the header of {path.name}: {err}"
+            logging.warning(msg)
+
+    return SheetInfo(
+        path=str(path),
+        dir=str(path.parent),
+        stem=path.stem,
+        format=format_,
+        width=width,
+        height=height,
+        bytes=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+        sha256=digest.hexdigest(),
+    )
@@ -0,0 +1,164 @@
+import csv
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from finder.pylib import sheet_util
+
+HASH_SIZE = 16  # The hash has HASH_SIZE ** 2 bits
+HASH_DECODE = 64  # Decode sheets to at least this many pixels on the short side
+
+
+def sheet_hash(path, hash_size=HASH_SIZE) -> int | None:
+    """Get a difference hash of the sheet from a reduced decode."""
+    sheet = sheet_util.get_lazy_sheet(path)
+    if not sheet:
+        return None
+
+    try:
+        image = sheet.read_reduced(max(1, min(sheet.size) // HASH_DECODE))
+    except sheet_util.IMAGE_EXCEPTIONS as err:
+        msg = f"Could not hash {path.name}: {err}"
+        logging.exception(msg)
+        return None
+
+    return image_hash(image, hash_size)
+
+
+def image_hash(image, hash_size=HASH_SIZE) -> int:
+    """Compare neighboring pixels of a tiny gray image to make a hash."""
+    image = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.BOX)
+    pixels = np.asarray(image, dtype=np.int16)
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def distance(hash1: int, hash2: int) -> int:
+    return (hash1 ^ hash2).bit_count()
+
+
+class BKTree:
+    """
+    A Burkhard-Keller tree for finding hashes within a Hamming distance.
+
+    Every node keeps its children by their distance to the node, so a search only
+    visits children in the range [distance - max_distance, distance + max_distance].
+    """
+
+    def __init__(self):
+        self.root = None
+
+    def add(self, hash_: int, item) -> None:
+        if self.root is None:
+            self.root = (hash_, [item], {})
+            return
+
+        node = self.root
+        while True:
+            dist = distance(hash_, node[0])
+            if dist == 0:
+                node[1].append(item)
+                return
+            if dist not in node[2]:
+                node[2][dist] = (hash_, [item], {})
+                return
+            node = node[2][dist]
+
+    def find(self, hash_: int, max_distance: int) -> list:
+        """Get all items with a hash within the max_distance of the given hash."""
+        found = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            dist = distance(hash_, node[0])
+            if dist <= max_distance:
+                found += node[1]
+            stack += [
+                child
+                for d, child in node[2].items()
+                if dist - max_distance <= d <= dist + max_distance
+            ]
+        return found
+
+
+def find_duplicates(hashes: dict[str, int], max_distance: int) -> dict[str, str]:
+    """
+    Cluster sheets with similar hashes.
+
+    Returns a mapping of every sheet to the representative of its cluster. Sheets
+    are visited in sorted order, and each sheet that is not in a cluster yet becomes
+    the representative of a new cluster. The cluster gets every unclustered sheet
+    within max_distance of the representative. Clusters do not chain from member to
+    member, because many different herbarium sheets share the same layout.
+    """
+    tree = BKTree()
+    for key, hash_ in hashes.items():
+        tree.add(hash_, key)
+
+    duplicates = {}
+    for key in sorted(hashes):
+        if key in duplicates:
+            continue
+        for other in tree.find(hashes[key], max_distance):
+            duplicates.setdefault(other, key)
+
+    return {k: duplicates[k] for k in sorted(hashes)}
+
+
+def hash_sheets(paths, index_csv=None, workers=None) -> dict[str, int]:
+    """
+    Hash the sheets in parallel.
+
+    Hashes are stored in the index CSV and are reused when a sheet's size and
+    modification time have not changed.
+    """
+    index = read_index(index_csv) if index_csv else {}
+
+    hashes, todo, stats = {}, [], {}
+    for path in paths:
+        stat = path.stat()
+        stats[str(path)] = (stat.st_size, stat.st_mtime_ns)
+        old = index.get(str(path))
+        if old and old[:2] == stats[str(path)]:
+            hashes[str(path)] = old[2]
+        else:
+            todo.append(path)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for path, hash_ in zip(todo, executor.map(sheet_hash, todo), strict=True):
+            if hash_ is not None:
+                hashes[str(path)] = hash_
+
+    if index_csv:
+        write_index(index_csv, {k: (*stats[k], v) for k, v in hashes.items()})
+
+    return hashes
+
+
+def read_index(index_csv) -> dict[str, tuple[int, int, int]]:
+    if not index_csv.exists():
+        return {}
+    with index_csv.open() as csv_file:
+        reader = csv.DictReader(csv_file)
+        return {
+            r["path"]: (int(r["bytes"]), int(r["mtime_ns"]), int(r["hash"], 16))
+            for r in reader
+        }
+
+
+def write_index(index_csv, index: dict[str, tuple[int, int, int]]) -> None:
+    with index_csv.open("w") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["path", "bytes", "mtime_ns", "hash"])
+        for path, (size, mtime, hash_) in sorted(index.items()):
+            writer.writerow([path, size, mtime, f"{hash_:x}"])
+
+
+def read_duplicates(duplicate_csv) -> dict[str, str]:
+    """Get a mapping of sheet stems to the stem of their cluster's representative."""
+    with duplicate_csv.open() as csv_file:
+        reader = csv.DictReader(csv_file)
+        return {Path(r["path"]).stem: Path(r["representative"]).stem for r in reader}
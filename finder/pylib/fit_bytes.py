@@ -0,0 +1,95 @@
+import functools
+import io
+import math
+from dataclasses import dataclass
+
+from finder.pylib import sheet_util
+
+PROBE_REDUCE = 4  # Estimate the compressed size from a sheet shrunk this much
+QUALITY_FORMATS = ("JPEG", "WEBP")
+REDUCED_DECODE_FORMATS = ("JPEG", "JPEG2000")  # These decode cheaply when reduced
+
+
+@dataclass
+class Fit:
+    data: bytes
+    reduce_by: int
+    quality: int | None = None
+
+
+def fit_to_bytes(
+    sheet: sheet_util.LazySheet,
+    image_format: str,
+    max_bytes: int,
+    min_reduce: int = 1,
+    *,
+    min_quality: int = 60,
+    max_quality: int = 95,
+) -> Fit:
+    """
+    Shrink and compress a sheet image so that it fits into max_bytes.
+
+    We want the smallest reduction factor that fits, and at that factor the highest
+    encoder quality that fits. The starting factor is estimated from the compressed
+    size of a cheap reduced decode, and then checked with real encodings. JPEG and
+    JPEG 2000 sheets are decoded at a reduced size for every factor we try, and
+    other sheets are decoded once.
+    """
+    # Other formats would be fully decoded for every factor we try, so decode once
+    if sheet.format not in REDUCED_DECODE_FORMATS:
+        _ = sheet.image
+
+    has_quality = image_format in QUALITY_FORMATS
+    low_quality = min_quality if has_quality else None
+    high_quality = max_quality if has_quality else None
+
+    @functools.lru_cache(maxsize=2)
+    def reduced(reduce_by):
+        return sheet.read_reduced(reduce_by)
+
+    def encode(reduce_by, quality):
+        return encode_image(reduced(reduce_by), image_format, quality)
+
+    # Guess the reduction factor from the bytes per pixel of a reduced image
+    probe = sheet.read_reduced(PROBE_REDUCE)
+    per_pixel = len(encode_image(probe, image_format, high_quality)) / math.prod(
+        probe.size
+    )
+    pixels = math.prod(sheet.size)
+    reduce_by = max(min_reduce, math.ceil(math.sqrt(per_pixel * pixels / max_bytes)))
+
+    # Make sure the smallest encoding at this factor fits
+    data = encode(reduce_by, low_quality)
+    while len(data) > max_bytes and min(sheet.size) // reduce_by > 1:
+        reduce_by += 1
+        data = encode(reduce_by, low_quality)
+
+    # Walk back while a smaller reduction still fits
+    while reduce_by > min_reduce:
+        smaller = encode(reduce_by - 1, low_quality)
+        if len(smaller) > max_bytes:
+            break
+        reduce_by, data = reduce_by - 1, smaller
+
+    if not has_quality:
+        return Fit(data, reduce_by)
+
+    # Find the highest quality that fits
+    quality = min_quality
+    low, high = min_quality + 1, max_quality
+    while low <= high:
+        middle = (low + high) // 2
+        encoded = encode(reduce_by, middle)
+        if len(encoded) <= max_bytes:
+            quality, data, low = middle, encoded, middle + 1
+        else:
+            high = middle - 1
+
+    return Fit(data, reduce_by, quality)
+
+
+def encode_image(image, image_format, quality=None) -> bytes:
+    kwargs = {} if quality is None else {"quality": quality}
+    with io.BytesIO() as buffer:
+        image.save(buffer, format=image_format, **kwargs)
+        return buffer.getvalue()
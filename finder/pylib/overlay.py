@@ -0,0 +1,71 @@
+import logging
+import math
+
+import numpy as np
+import numpy.typing as npt
+from PIL import Image, ImageDraw
+
+from finder.pylib import const, sheet_util
+
+COLORS = {
+    const.TYPEWRITTEN: (255, 140, 0),  # Orange
+    const.OTHER: (0, 128, 128),  # Teal
+}
+CAPTION_HEIGHT = 14
+
+
+def render_sheet(
+    sheet_path,
+    boxes: npt.NDArray,
+    classes: list[str],
+    *,
+    fractional: bool,
+    reduce_by: int = 1,
+    line_width: int = 3,
+) -> Image.Image | None:
+    """
+    Draw the label boxes on a reduced decode of the sheet.
+
+    The boxes are in left, top, right, bottom order. They are either fractions of the
+    sheet size or pixel coordinates of the full sized sheet.
+    """
+    sheet = sheet_util.get_lazy_sheet(sheet_path)
+    if not sheet:
+        return None
+
+    try:
+        image = sheet.read_reduced(reduce_by)
+    except sheet_util.IMAGE_EXCEPTIONS as err:
+        msg = f"Could not show {sheet_path.name}: {err}"
+        logging.exception(msg)
+        return None
+
+    if fractional:
+        scale = np.array(image.size * 2, dtype=np.float64)
+    else:
+        scale = np.array(image.size * 2, dtype=np.float64) / (sheet.size * 2)
+
+    draw = ImageDraw.Draw(image)
+    for box, cls in zip(np.asarray(boxes) * scale, classes, strict=True):
+        draw.rectangle(box.round().tolist(), outline=COLORS[cls], width=line_width)
+
+    return image
+
+
+def mosaic(images, captions, columns, cell_height) -> Image.Image:
+    """Tile images into a contact sheet with a caption under each one."""
+    rows = math.ceil(len(images) / columns)
+    cell_width = max(round(i.width * cell_height / i.height) for i in images)
+    full_height = cell_height + CAPTION_HEIGHT
+
+    sheet = Image.new("RGB", (columns * cell_width, rows * full_height), "white")
+    draw = ImageDraw.Draw(sheet)
+
+    for i, (image, caption) in enumerate(zip(images, captions, strict=True)):
+        x = (i % columns) * cell_width
+        y = (i // columns) * full_height
+        width = round(image.width * cell_height / image.height)
+        sheet.paste(image.resize((width, cell_height)), (x, y))
+        draw.text((x + 2, y + cell_height + 1), caption, fill="black")
+
+    return sheet
@@ -0,0 +1,131 @@
+import csv
+import hashlib
+import logging
+from collections.abc import Iterable
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+
+from finder.pylib import box_calc
+from finder.pylib.const import CLASS2INT, CLASSES, OTHER, TYPEWRITTEN
+
+STATE_CSV = "labels.csv"  # Labels and their sheet digests in the state directory
+LABEL_FIELDS = ["sheet", "left", "top", "right", "bottom", "class"]
+
+
+def update(
+    sheets: Iterable[tuple[str, npt.NDArray, npt.NDArray]],
+    state_dir: Path,
+    iou_threshold: float,
+    expand_by: int = 1,
+    sheet_expand_by: dict[str, int] | None = None,
+) -> tuple[list[dict], dict[str, str]]:
+    """
+    Only reconcile the sheets whose boxes changed since the last run.
+
+    The state directory holds the labels from the last run with a digest of each
+    sheet's inputs. Sheets with the same digest reuse their labels from the state.
+    Sheets that are not in sheets are dropped. Each sheet is expanded by its entry in
+    sheet_expand_by or else by expand_by. Returns the labels and the new digests.
+    """
+    sheet_expand_by = sheet_expand_by or {}
+    old = read_state(state_dir / STATE_CSV)
+
+    reconciled = []
+    digests = {}
+    changed = 0
+
+    for sheet_id, boxes, classes in sheets:
+        expand = sheet_expand_by.get(sheet_id, expand_by)
+        digest = sheet_digest(boxes, classes, expand, iou_threshold)
+        digests[sheet_id] = digest
+
+        old_digest, old_labels = old.get(sheet_id, (None, []))
+        if old_digest == digest and old_labels:
+            reconciled += old_labels
+        else:
+            groups = box_calc.find_box_groups(boxes, iou_threshold)
+            reconciled += reconcile_sheet(sheet_id, boxes, classes, groups, expand)
+            changed += 1
+
+    msg = f"Reconciled {changed} changed sheets of {len(digests)}"
+    logging.info(msg)
+
+    return reconciled, digests
+
+
+def sheet_digest(boxes, classes, expand_by, iou_threshold) -> str:
+    """Hash everything that goes into a sheet's labels."""
+    digest = hashlib.sha1(usedforsecurity=False)
+    digest.update(np.ascontiguousarray(boxes, dtype=np.int32).tobytes())
+    digest.update(np.ascontiguousarray(classes, dtype=np.int8).tobytes())
+    digest.update(f"{expand_by} {iou_threshold}".encode())
+    return digest.hexdigest()
+
+
+def read_state(state_csv) -> dict[str, tuple[str, list[dict]]]:
+    """Get the digest and the labels of every sheet from the last run."""
+    state = {}
+    if not state_csv.exists():
+        return state
+    with state_csv.open() as csv_file:
+        reader = csv.DictReader(csv_file)
+        for row in reader:
+            digest = row.pop("digest")
+            state.setdefault(row["sheet"], (digest, []))[1].append(row)
+    return state
+
+
+def save(reconciled_csv, reconciled, state_dir=None, digests=None) -> None:
+    """Write the labels, and then the state once the labels it describes exist."""
+    write_labels(reconciled_csv, reconciled)
+    if state_dir:
+        write_state(state_dir / STATE_CSV, reconciled, digests)
+
+
+def write_labels(reconciled_csv, reconciled) -> None:
+    with reconciled_csv.open("w") as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=LABEL_FIELDS)
+        writer.writeheader()
+        writer.writerows(reconciled)
+
+
+def write_state(state_csv, reconciled, digests) -> None:
+    """Save the labels with their sheet's digest in one file, so they always agree."""
+    state_csv.parent.mkdir(parents=True, exist_ok=True)
+    temp = state_csv.with_suffix(".tmp")
+    with temp.open("w") as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=[*LABEL_FIELDS, "digest"])
+        writer.writeheader()
+        for label in reconciled:
+            writer.writerow(label | {"digest": digests[label["sheet"]]})
+    temp.replace(state_csv)
+
+
+def reconcile_sheet(sheet_id, boxes, classes, groups, expand_by) -> list[dict]:
+    labels = []
+    for grp in np.unique(groups):
+        label = {"sheet": sheet_id}
+        label |= merge_boxes(boxes[groups == grp], expand_by)
+        label |= merge_types(classes[groups == grp])
+        labels.append(label)
+    return labels
+
+
+def merge_boxes(boxes: npt.NDArray, expand_by) -> dict[str, float]:
+    """Get the outside dimensions of the boxes."""
+    return {
+        "left": np.min(boxes[:, 0]) * expand_by,
+        "top": np.min(boxes[:, 1]) * expand_by,
+        "right": np.max(boxes[:, 2]) * expand_by,
+        "bottom": np.max(boxes[:, 3]) * expand_by,
+    }
+
+
+def merge_types(classes: npt.NDArray) -> dict[str, str]:
+    """Get the most common type from the class codes."""
+    counts = np.bincount(classes, minlength=len(CLASSES))
+    other, typewritten = counts[CLASS2INT[OTHER]], counts[CLASS2INT[TYPEWRITTEN]]
+    cls: str = OTHER if other > typewritten else TYPEWRITTEN
+    return {"class": cls}
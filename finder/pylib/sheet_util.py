@@ -1,8 +1,11 @@
 import logging
+import math
 import warnings
 
 from PIL import Image, UnidentifiedImageError
 
+from finder.pylib.storage import Blob
+
 IMAGE_EXCEPTIONS = (
     UnidentifiedImageError,
     ValueError,
@@ -11,17 +14,18 @@ IMAGE_EXCEPTIONS = (
     OSError,
 )
 
+# Pillow decodes these tile codecs one tile (or strip) at a time
+PARTIAL_CODECS = ("raw", "packbits")
 
-def to_yolo_image(path, yolo_images, yolo_size) -> tuple[int, int] | None:
-    yolo = yolo_images / path.name
 
+def to_yolo_image(path, yolo_images, yolo_size) -> tuple[int, int] | None:
     image = get_sheet_image(path)
     if not image:
         return None
 
     try:
         resized = image.resize((yolo_size, yolo_size))
-        resized.save(yolo)
+        yolo_images.save_image(path.name, resized)
 
     except IMAGE_EXCEPTIONS as err:
         msg = f"Could not prepare {path.name}: {err}"
@@ -36,7 +40,7 @@ def get_sheet_image(path):
         warnings.filterwarnings("ignore", category=UserWarning)  # No EXIF warnings
 
         try:
-            image = Image.open(path).convert("RGB")
+            image = Image.open(source(path)).convert("RGB")
 
         except IMAGE_EXCEPTIONS as err:
             msg = f"Could not prepare {path.name}: {err}"
@@ -44,3 +48,147 @@ def get_sheet_image(path):
             return None
 
         return image
+
+
+def get_lazy_sheet(path):
+    try:
+        return LazySheet(path)
+
+    except IMAGE_EXCEPTIONS as err:
+        msg = f"Could not prepare {path.name}: {err}"
+        logging.exception(msg)
+        return None
+
+
+class LazySheet:
+    """
+    A sheet image that is only decoded as much as needed.
+
+    The size comes from the image header. Regions are cut from tiled or stripped
+    TIFFs by decoding only the tiles that cover the region. This only works for
+    uncompressed and PackBits TIFFs: Pillow decodes LZW, deflate, and JPEG TIFFs
+    with libtiff as a single tile. Those and all other formats fall back to one full
+    decode that is cached for later regions.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._image = None
+
+        with self._open() as image:
+            self.size = image.size
+            self.format = image.format
+            self.partial = self.format == "TIFF" and all(
+                t[0] in PARTIAL_CODECS for t in image.tile
+            )
+
+    def read_region(self, box):
+        """Get the region in left, top, right, bottom order as an RGB image."""
+        if not self.partial:
+            return self.image.crop(box)
+
+        with self._open() as image:
+            tiles = [t for t in image.tile if overlaps(t[1], box)]
+            if not tiles:
+                return Image.new("RGB", (box[2] - box[0], box[3] - box[1]))
+
+            # The area covered by the tiles becomes the new image
+            left = min(t[1][0] for t in tiles)
+            top = min(t[1][1] for t in tiles)
+            right = max(t[1][2] for t in tiles)
+            bottom = max(t[1][3] for t in tiles)
+
+            image.tile = [
+                moved_tile(
+                    t, (t[1][0] - left, t[1][1] - top, t[1][2] - left, t[1][3] - top)
+                )
+                for t in tiles
+            ]
+            image._size = (right - left, bottom - top)
+            image.load()
+
+            region = image.crop(
+                (box[0] - left, box[1] - top, box[2] - left, box[3] - top)
+            )
+            return region.convert("RGB")
+
+    def read_reduced(self, reduce_by):
+        """
+        Get the whole sheet shrunk by this factor as an RGB image.
+
+        JPEG 2000 sheets are decoded at a lower resolution level and JPEG sheets are
+        scaled while decoding, so we never hold the full sized image for them.
+        """
+        if self._image is not None or reduce_by <= 1:
+            return self.image.reduce(max(reduce_by, 1))
+
+        width, height = self.size
+        size = (math.ceil(width / reduce_by), math.ceil(height / reduce_by))
+
+        if self.format == "JPEG2000":
+            image = self._read_level(int(math.log2(reduce_by)))
+
+        else:
+            with self._open() as image:
+                if self.format == "JPEG":
+                    image.draft("RGB", size)
+                image = image.convert("RGB")
+
+        if image.size != size:
+            image = image.resize(size, Image.Resampling.BOX)
+
+        return image
+
+    def _read_level(self, level):
+        """
+        Decode a JPEG 2000 sheet at a lower resolution level.
+
+        A file only has so many levels, and asking for more fails. So we step back
+        to fewer levels until the decode works.
+        """
+        while True:
+            with self._open() as image:
+                image.reduce = level
+                try:
+                    image.load()
+                except OSError:
+                    if level == 0:
+                        raise
+                    level -= 1
+                    continue
+                return image.convert("RGB")
+
+    @property
+    def image(self):
+        """Decode the whole sheet once."""
+        if self._image is None:
+            with self._open() as image:
+                self._image = image.convert("RGB")
+        return self._image
+
+    def _open(self):
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", category=UserWarning)  # No EXIF
+            return Image.open(source(self.path))
+
+
+def source(path):
+    """Sheets are either local paths or blobs read from storage."""
+    if isinstance(path, Blob):
+        return path.path or path.open()
+    return path
+
+
+def moved_tile(tile, extents):
+    """Copy a tile with new extents. Tiles are plain tuples before Pillow 11."""
+    parts = (tile[0], extents, *tile[2:])
+    return tile._make(parts) if hasattr(tile, "_make") else parts
+
+
+def overlaps(extents, box) -> bool:
+    return (
+        extents[0] < box[2]
+        and extents[2] > box[0]
+        and extents[1] < box[3]
+        and extents[3] > box[1]
+    )
@@ -0,0 +1,295 @@
+import fnmatch
+import io
+import logging
+import tarfile
+import threading
+import zipfile
+from abc import ABC, abstractmethod
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+
+from PIL import Image
+
+CHUNK_SIZE = 8 * 1024 * 1024  # Fetch large objects in ranges of this many bytes
+WORKERS = 8
+
+
+@dataclass
+class Blob:
+    """
+    A file read from storage.
+
+    Local files are not read up front. Their blobs only hold the path, so that
+    readers can seek in the file and only read the parts they need.
+    """
+
+    key: str
+    data: bytes | None = None
+    path: Path | None = None
+
+    @property
+    def name(self) -> str:
+        return PurePosixPath(self.key).name
+
+    @property
+    def stem(self) -> str:
+        return stem(self.key)
+
+    @property
+    def suffix(self) -> str:
+        return PurePosixPath(self.key).suffix
+
+    def open(self):
+        return self.path.open("rb") if self.path else io.BytesIO(self.data)
+
+
+class Storage(ABC):
+    """
+    Where sheet images come from and where output images go.
+
+    Names are relative to the storage root and use forward slashes.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    @abstractmethod
+    def list(self, pattern="*") -> list[str]:
+        """Get the names of the files matching the pattern."""
+
+    @abstractmethod
+    def read(self, name) -> bytes:
+        """Get the contents of a file."""
+
+    @abstractmethod
+    def write(self, name, data: bytes) -> None:
+        """Save the contents of a file."""
+
+    def save_image(self, name, image, **kwargs) -> None:
+        with io.BytesIO() as buffer:
+            image.save(buffer, format=image_format(name), **kwargs)
+            self.write(name, buffer.getvalue())
+
+    def close(self) -> None:  # noqa: B027
+        """Finish all writes."""
+
+    def prefetch(self, names, workers=WORKERS, ahead=2 * WORKERS):
+        """
+        Read files in the background while the caller works on earlier ones.
+
+        Files that cannot be read are logged and skipped.
+        """
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for name in names:
+                pending.append((name, executor.submit(self.read, name)))
+                while len(pending) >= ahead:
+                    yield from fetched(*pending.popleft())
+            while pending:
+                yield from fetched(*pending.popleft())
+
+
+def fetched(name, future) -> Iterator[Blob]:
+    """Wrap a finished read in a blob, or log why the read failed."""
+    try:
+        yield Blob(name, future.result())
+    except Exception as err:  # noqa: BLE001 Each storage fails in its own way
+        msg = f"Could not read {name}: {err}"
+        logging.warning(msg)
+
+
+class LocalStorage(Storage):
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def list(self, pattern="*") -> list[str]:
+        return sorted(p.name for p in self.root.glob(pattern) if p.is_file())
+
+    def read(self, name) -> bytes:
+        return (self.root / name).read_bytes()
+
+    def write(self, name, data: bytes) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        (self.root / name).write_bytes(data)
+
+    def save_image(self, name, image, **kwargs) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        image.save(self.root / name, **kwargs)
+
+    def prefetch(self, names, workers=WORKERS, ahead=2 * WORKERS):
+        """Local files are read when they are used."""
+        for name in names:
+            yield Blob(name, path=self.root / name)
+
+
+class ZipStorage(Storage):
+    """Read members of a zip archive or append new ones to it."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.archive = None
+
+    def _archive(self, mode):
+        if self.archive is None or self.archive.mode != mode:
+            if self.archive is not None:
+                self.archive.close()
+            self.archive = zipfile.ZipFile(self.path, mode)
+        return self.archive
+
+    def list(self, pattern="*") -> list[str]:
+        with self.lock:
+            names = self._archive("r").namelist()
+        return sorted(n for n in names if not n.endswith("/") and match(n, pattern))
+
+    def read(self, name) -> bytes:
+        with self.lock:
+            return self._archive("r").read(name)
+
+    def write(self, name, data: bytes) -> None:
+        with self.lock:
+            self._archive("a").writestr(name, data)
+
+    def close(self) -> None:
+        with self.lock:
+            if self.archive is not None:
+                self.archive.close()
+                self.archive = None
+
+
+class TarStorage(Storage):
+    """Read members of a tar archive. These may be compressed."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.archive = tarfile.open(self.path)  # noqa: SIM115
+
+    def list(self, pattern="*") -> list[str]:
+        with self.lock:
+            members = self.archive.getmembers()
+        return sorted(m.name for m in members if m.isfile() and match(m.name, pattern))
+
+    def read(self, name) -> bytes:
+        with self.lock:
+            return self.archive.extractfile(name).read()
+
+    def write(self, name, data: bytes) -> None:
+        msg = f"Cannot write {name} to the tar archive {self.path}."
+        raise ValueError(msg)
+
+    def close(self) -> None:
+        self.archive.close()
+
+
+class S3Storage(Storage):
+    """
+    Objects in an S3 compatible store.
+
+    Large objects are fetched as concurrent byte ranges and writes are uploaded in
+    the background. The endpoint is taken from the AWS_ENDPOINT_URL environment
+    variable when it is not given.
+    """
+
+    def __init__(self, bucket, prefix="", endpoint_url=None, workers=WORKERS):
+        import boto3  # noqa: PLC0415
+
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.sizes = {}
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.uploads = set()
+
+    def list(self, pattern="*") -> list[str]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        pages = paginator.paginate(Bucket=self.bucket, Prefix=self.prefix)
+        for page in pages:
+            for obj in page.get("Contents", []):
+                name = obj["Key"].removeprefix(self.prefix)
+                self.sizes[name] = obj["Size"]
+        return sorted(n for n in self.sizes if match(n, pattern))
+
+    def read(self, name) -> bytes:
+        key = self.prefix + name
+
+        size = self.sizes.get(name)
+        if size is None:
+            size = self.client.head_object(Bucket=self.bucket, Key=key)
+            size = size["ContentLength"]
+
+        if size <= CHUNK_SIZE:
+            return self._get(key)
+
+        ranges = [
+            f"bytes={start}-{min(start + CHUNK_SIZE, size) - 1}"
+            for start in range(0, size, CHUNK_SIZE)
+        ]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            chunks = executor.map(lambda r: self._get(key, r), ranges)
+            return b"".join(chunks)
+
+    def _get(self, key, byte_range=None) -> bytes:
+        kwargs = {"Range": byte_range} if byte_range else {}
+        response = self.client.get_object(Bucket=self.bucket, Key=key, **kwargs)
+        return response["Body"].read()
+
+    def write(self, name, data: bytes) -> None:
+        # Do not let too many uploads pile up in memory
+        if len(self.uploads) >= 2 * self.workers:
+            done, self.uploads = wait(self.uploads, return_when=FIRST_COMPLETED)
+            for future in done:
+                future.result()
+
+        key = self.prefix + name
+        future = self.executor.submit(
+            self.client.put_object, Bucket=self.bucket, Key=key, Body=data
+        )
+        self.uploads.add(future)
+
+    def close(self) -> None:
+        uploads, self.uploads = self.uploads, set()
+        self.executor.shutdown()
+        for future in uploads:
+            future.result()
+
+
+def get_storage(location) -> Storage:
+    """
+    Get the storage for a location.
+
+    Locations are either a local directory, a zip or tar archive, or an S3 URL like
+    "s3://bucket/prefix".
+    """
+    location = str(location)
+
+    if location.startswith("s3://"):
+        bucket, _, prefix = location.removeprefix("s3://").partition("/")
+        return S3Storage(bucket, prefix)
+
+    suffixes = Path(location).suffixes
+    if suffixes[-1:] == [".zip"]:
+        return ZipStorage(location)
+    if ".tar" in suffixes or suffixes[-1:] in ([".tgz"], [".tbz2"], [".txz"]):
+        return TarStorage(location)
+
+    return LocalStorage(location)
+
+
+def image_format(name) -> str | None:
+    return Image.registered_extensions().get(PurePosixPath(name).suffix.lower())
+
+
+def stem(name) -> str:
+    return PurePosixPath(name).stem
+
+
+def match(name, pattern) -> bool:
+    return fnmatch.fnmatch(PurePosixPath(name).name, pattern)
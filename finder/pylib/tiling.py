@@ -0,0 +1,251 @@
+import csv
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import numpy as np
+import numpy.typing as npt
+from PIL import Image
+
+from finder.pylib import box_calc, sheet_util, storage
+
+INDEX_FIELDS = ["tile", "sheet", "left", "top", "tile_size", "width", "height"]
+SEAM_IOU = 0.5  # Match boxes this well inside the area shared by their tiles
+
+
+def tile_starts(length: int, tile_size: int, overlap: int) -> list[int]:
+    """Get where the tiles start along one side of the sheet."""
+    if length <= tile_size:
+        return [0]
+    starts = list(range(0, length - tile_size, tile_size - overlap))
+    starts.append(length - tile_size)  # The last tile is flush with the edge
+    return starts
+
+
+def sheet_tiles(
+    sheet: sheet_util.LazySheet, tile_size: int, overlap: int
+) -> Iterator[tuple[int, int, Image.Image]]:
+    """
+    Cut a sheet into overlapping square tiles.
+
+    The sheet is read one band of tiles at a time, so for uncompressed and PackBits
+    TIFFs we only decode the strips under the band. Other sheets are decoded once
+    (see LazySheet). Tiles that hang off the edge of the sheet are padded with
+    black.
+    """
+    width, height = sheet.size
+    for top in tile_starts(height, tile_size, overlap):
+        band = sheet.read_region((0, top, width, min(top + tile_size, height)))
+        for left in tile_starts(width, tile_size, overlap):
+            yield left, top, band.crop((left, 0, left + tile_size, tile_size))
+
+
+def to_yolo_tiles(path, yolo_images, tile_size, overlap) -> list[dict]:
+    """Save a sheet's tiles and return their rows for the tile index."""
+    sheet = sheet_util.get_lazy_sheet(path)
+    if not sheet:
+        return []
+
+    rows = []
+    for left, top, tile in sheet_tiles(sheet, tile_size, overlap):
+        name = f"{path.stem}_{left}_{top}{path.suffix}"
+        yolo_images.save_image(name, tile)
+        rows.append(
+            {
+                "tile": storage.stem(name),
+                "sheet": path.name,
+                "left": left,
+                "top": top,
+                "tile_size": tile_size,
+                "width": sheet.size[0],
+                "height": sheet.size[1],
+            }
+        )
+    return rows
+
+
+@contextmanager
+def open_index(index_csv) -> Iterator[csv.DictWriter]:
+    """Open the tile index so each sheet's rows are written as they are made."""
+    with index_csv.open("w") as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=INDEX_FIELDS)
+        writer.writeheader()
+        yield writer
+
+
+def read_index(index_csv) -> dict[str, dict]:
+    with index_csv.open() as csv_file:
+        reader = csv.DictReader(csv_file)
+        return {
+            r["tile"]: {
+                k: v if k in ("tile", "sheet") else int(v) for k, v in r.items()
+            }
+            for r in reader
+        }
+
+
+def from_tile(ln, tile) -> tuple[int, list[float], float]:
+    """Convert a tile's YOLO result line into sheet pixel coordinates."""
+    cls, center_x, center_y, width, height, *conf = ln.split()
+
+    size = tile["tile_size"]
+    center_x = float(center_x) * size + tile["left"]
+    center_y = float(center_y) * size + tile["top"]
+    radius_x = float(width) * size / 2
+    radius_y = float(height) * size / 2
+
+    # Clip boxes that stray into the padding
+    box = [
+        max(center_x - radius_x, 0.0),
+        max(center_y - radius_y, 0.0),
+        min(center_x + radius_x, tile["width"]),
+        min(center_y + radius_y, tile["height"]),
+    ]
+
+    return int(cls), box, float(conf[0]) if conf else 1.0
+
+
+def read_tile_results(tiles, yolo_results_dir) -> dict[str, list[tuple]]:
+    """
+    Gather the tile results for each sheet in sheet pixel coordinates.
+
+    Each result is the class, box, confidence, and tile region. Sheets without any
+    boxes are left out.
+    """
+    sheets = {}
+    for path in sorted(yolo_results_dir.glob("*.txt")):
+        if tile := tiles.get(path.stem):
+            with path.open() as lb:
+                region = tile_region(tile)
+                found = [(*from_tile(ln, tile), region) for ln in lb if ln.strip()]
+            if found:
+                sheets.setdefault(tile["sheet"], []).extend(found)
+    return sheets
+
+
+def tile_region(tile) -> list[int]:
+    """Get the part of the sheet that a tile covers."""
+    return [
+        tile["left"],
+        tile["top"],
+        min(tile["left"] + tile["tile_size"], tile["width"]),
+        min(tile["top"] + tile["tile_size"], tile["height"]),
+    ]
+
+
+def merge_tile_boxes(
+    boxes: npt.NDArray,
+    classes: npt.NDArray,
+    confs: npt.NDArray,
+    regions: npt.NDArray,
+    threshold: float,
+    *,
+    seam_threshold: float = SEAM_IOU,
+) -> tuple[npt.NDArray, npt.NDArray, npt.NDArray]:
+    """
+    Collapse the duplicate boxes found where tiles overlap.
+
+    A label wider than the tile overlap is cut by the tile edges, and each tile only
+    finds a piece of it. The pieces share little area, so their IoU is too low to
+    match. But inside the area where their two tiles overlap, both tiles see the
+    same part of the label. So we first join boxes from different tiles when their
+    IoU is at least seam_threshold after clipping both to the area their tiles
+    share. Then the joined boxes are grouped with find_box_groups at threshold.
+
+    Each group becomes the box around all of its boxes, with the class and
+    confidence of its most confident box. The regions are the parts of the sheet
+    covered by each box's tile.
+    """
+    if len(boxes) == 0:
+        return boxes, classes, confs
+
+    seams = seam_groups(boxes, regions, seam_threshold)
+    boxes, classes, confs = merge_groups(boxes, classes, confs, seams)
+
+    groups = box_calc.find_box_groups(boxes, threshold)
+    return merge_groups(boxes, classes, confs, groups)
+
+
+def seam_groups(boxes, regions, threshold) -> npt.NDArray:
+    """Group boxes from different tiles that match where their tiles overlap."""
+    first, second = np.triu_indices(len(boxes), k=1)
+    other_tile = np.any(regions[first] != regions[second], axis=1)
+    first, second = first[other_tile], second[other_tile]
+
+    # The area shared by each pair of tiles
+    shared = np.hstack(
+        [
+            np.maximum(regions[first, :2], regions[second, :2]),
+            np.minimum(regions[first, 2:], regions[second, 2:]),
+        ]
+    )
+
+    def clip(box):
+        return np.hstack(
+            [
+                np.maximum(box[:, :2], shared[:, :2]),
+                np.minimum(box[:, 2:], shared[:, 2:]),
+            ]
+        )
+
+    a, b = clip(boxes[first]), clip(boxes[second])
+    inter = np.hstack([np.maximum(a[:, :2], b[:, :2]), np.minimum(a[:, 2:], b[:, 2:])])
+
+    def area(box):
+        return np.maximum(0.0, box[:, 2] - box[:, 0]) * np.maximum(
+            0.0, box[:, 3] - box[:, 1]
+        )
+
+    inter_area = area(inter)
+    union = area(a) + area(b) - inter_area
+    iou = np.divide(inter_area, union, out=np.zeros_like(union), where=union > 0)
+
+    parent = list(range(len(boxes)))
+
+    def root(box):
+        while parent[box] != box:
+            parent[box] = parent[parent[box]]
+            box = parent[box]
+        return box
+
+    for i, j in zip(first[iou >= threshold], second[iou >= threshold], strict=True):
+        a_root, b_root = root(i), root(j)
+        parent[max(a_root, b_root)] = min(a_root, b_root)
+
+    return np.array([root(b) for b in range(len(boxes))])
+
+
+def merge_groups(boxes, classes, confs, groups):
+    merged_boxes, merged_classes, merged_confs = [], [], []
+    for group in np.unique(groups):
+        members = groups == group
+        group_boxes = boxes[members]
+        best = np.argmax(confs[members])
+        merged_boxes.append(
+            [
+                group_boxes[:, 0].min(),
+                group_boxes[:, 1].min(),
+                group_boxes[:, 2].max(),
+                group_boxes[:, 3].max(),
+            ]
+        )
+        merged_classes.append(classes[members][best])
+        merged_confs.append(confs[members][best])
+
+    return (
+        np.array(merged_boxes, dtype=np.float64),
+        np.array(merged_classes),
+        np.array(merged_confs),
+    )
+
+
+def to_yolo_format(box, cls, conf, width, height) -> str:
+    """Convert a sheet pixel box into a YOLO result line for the whole sheet."""
+    left, top, right, bottom = box
+    center_x = (left + right) / 2 / width
+    center_y = (top + bottom) / 2 / height
+    box_width = (right - left) / width
+    box_height = (bottom - top) / height
+    return (
+        f"{cls} {center_x:.6f} {center_y:.6f} {box_width:.6f} {box_height:.6f} "
+        f"{conf:.6f}\n"
+    )
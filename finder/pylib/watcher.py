@@ -0,0 +1,140 @@
+import json
+import os
+import statistics
+import time
+from collections import deque
+from pathlib import Path
+
+SKIP_SUFFIXES = (".part", ".tmp", ".crdownload")
+
+
+class DirWatcher:
+    """
+    Find new files in a directory as they are completed.
+
+    Each scan only stats directory entries, and a file is complete once its size and
+    modification time have not changed for settle seconds. Files are only returned
+    once, unless they change after they are returned.
+
+    Adding, removing, or renaming a file changes the directory's modification time.
+    When it has not changed and no files are still settling, the scan skips reading
+    the directory, so idle polls cost one stat no matter how big the directory is. A
+    file rewritten in place in an idle directory is not noticed until the directory
+    changes.
+    """
+
+    def __init__(self, directory, pattern=None, settle=2.0):
+        self.directory = Path(directory)
+        self.pattern = pattern
+        self.settle = settle
+        self.pending = {}  # Files that are still changing: name -> (stat, since)
+        self.done = {}  # Files that were returned: name -> stat
+        self.dir_mtime = None  # Directory modification time at the last full scan
+        self.scanned = 0.0  # When the last full scan happened
+
+    def seed(self, names) -> None:
+        """Treat these existing files as already returned."""
+        for name in names:
+            try:
+                stat = (self.directory / name).stat()
+            except FileNotFoundError:
+                continue
+            self.done[name] = (stat.st_size, stat.st_mtime_ns)
+
+    def scan(self, now=None) -> list[tuple[Path, float]]:
+        """Get the newly completed files and their modification times."""
+        now = time.time() if now is None else now
+        completed = []
+
+        # Only trust the directory time when it is clearly older than the last full
+        # scan, because coarse file system clocks can hide a change in the same tick
+        dir_stat = self.directory.stat()
+        if (
+            not self.pending
+            and dir_stat.st_mtime_ns == self.dir_mtime
+            and dir_stat.st_mtime < self.scanned - 1.0
+        ):
+            return completed
+
+        self.dir_mtime = dir_stat.st_mtime_ns
+        self.scanned = time.time()
+
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not self.wanted(entry):
+                    continue
+
+                stat = entry.stat()
+                key = (stat.st_size, stat.st_mtime_ns)
+
+                if self.done.get(entry.name) == key:
+                    continue
+
+                old = self.pending.get(entry.name)
+                if old is None or old[0] != key:
+                    self.pending[entry.name] = (key, now)
+                elif now - old[1] >= self.settle and stat.st_size > 0:
+                    del self.pending[entry.name]
+                    self.done[entry.name] = key
+                    completed.append((Path(entry.path), stat.st_mtime))
+
+        return sorted(completed)
+
+    def wanted(self, entry) -> bool:
+        name = entry.name
+        if name.startswith(".") or name.endswith(SKIP_SUFFIXES):
+            return False
+        if self.pattern and not Path(name).match(self.pattern):
+            return False
+        return entry.is_file()
+
+
+class ServiceStats:
+    """Queue depth and latencies of a running service."""
+
+    def __init__(self, window=1000):
+        self.started = time.time()
+        self.queued = 0
+        self.processed = 0
+        self.failed = 0
+        self.latencies = deque(maxlen=window)
+
+    def add(self, count=1):
+        self.queued += count
+
+    def finish(self, arrived, *, ok=True):
+        self.queued -= 1
+        if ok:
+            self.processed += 1
+        else:
+            self.failed += 1
+        self.latencies.append(time.time() - arrived)
+
+    def to_dict(self) -> dict:
+        latencies = sorted(self.latencies)
+        stats = {
+            "uptime": round(time.time() - self.started, 3),
+            "queue_depth": self.queued,
+            "processed": self.processed,
+            "failed": self.failed,
+        }
+        if latencies:
+            stats |= {
+                "latency_mean": round(statistics.fmean(latencies), 3),
+                "latency_p50": round(percentile(latencies, 0.50), 3),
+                "latency_p95": round(percentile(latencies, 0.95), 3),
+                "latency_max": round(latencies[-1], 3),
+            }
+        return stats
+
+
+def write_stats(path, stages: dict[str, ServiceStats]) -> None:
+    """Replace the stats file in one step so readers never see partial JSON."""
+    stats = {k: v.to_dict() for k, v in stages.items()}
+    temp = path.with_name(path.name + ".tmp")
+    temp.write_text(json.dumps(stats, indent=2))
+    temp.replace(path)
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(fraction * len(values)))]
@@ -0,0 +1,104 @@
+import csv
+import json
+import sys
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+
+from finder.pylib.const import OTHER, TYPEWRITTEN
+
+
+@dataclass
+class Classification:
+    """The boxes one volunteer drew on one sheet."""
+
+    classification_id: str
+    sheet_id: str
+    boxes: list[list[float]] = field(default_factory=list)
+    classes: list[str] = field(default_factory=list)
+
+
+def read_classifications(
+    export,
+    *,
+    workflow_id: str | None = None,
+    subject_field: str = "Filename",
+    typewritten: tuple[str, ...] = (TYPEWRITTEN,),
+) -> Iterator[Classification]:
+    """
+    Stream the boxes from a raw Zooniverse classifications export.
+
+    Each row holds the volunteer's marks in the "annotations" JSON and the sheet file
+    name in the "subject_data" JSON. Rows are parsed one at a time, so the export is
+    never held in memory. Only rectangle marks are used. A box is typewritten when
+    its tool label or one of its sub-task answers is in typewritten.
+    """
+    csv.field_size_limit(sys.maxsize)  # Annotations can be very long
+
+    with export.open() as raw:
+        reader = csv.DictReader(raw)
+        for row in reader:
+            if workflow_id and row["workflow_id"] != workflow_id:
+                continue
+
+            sheet_id = subject_name(row["subject_data"], subject_field)
+            if not sheet_id:
+                continue
+
+            classification = Classification(row["classification_id"], sheet_id)
+
+            for mark in rectangle_marks(json.loads(row["annotations"])):
+                classification.boxes.append(bbox_from_mark(mark))
+                cls = TYPEWRITTEN if mark_values(mark) & set(typewritten) else OTHER
+                classification.classes.append(cls)
+
+            yield classification
+
+
+def subject_name(subject_data: str, subject_field: str) -> str:
+    """Get the sheet file name from the subject data JSON."""
+    for subject in json.loads(subject_data).values():
+        if subject and subject.get(subject_field):
+            return subject[subject_field]
+    return ""
+
+
+def rectangle_marks(annotations: list[dict]) -> Iterator[dict]:
+    for task in annotations:
+        values = task.get("value")
+        if not isinstance(values, list):
+            continue
+        for mark in values:
+            if isinstance(mark, dict) and all(
+                isinstance(mark.get(k), int | float)
+                for k in ("x", "y", "width", "height")
+            ):
+                yield mark
+
+
+def bbox_from_mark(mark: dict) -> list[float]:
+    """Convert a rectangle mark into left, top, right, bottom order."""
+    x0, y0 = mark["x"], mark["y"]
+    x1, y1 = x0 + mark["width"], y0 + mark["height"]
+    return [min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)]
+
+
+def mark_values(mark: dict) -> set[str]:
+    """
+    Get the tool label and the answers to the mark's sub-tasks as text.
+
+    Single-choice answers are often the index of the choice, so numbers are kept as
+    text too.
+    """
+    values = {mark.get("tool_label")}
+    for detail in mark.get("details") or []:
+        value = detail.get("value") if isinstance(detail, dict) else None
+        answers = value if isinstance(value, list) else [value]
+        for answer in answers:
+            if isinstance(answer, dict):
+                answer = answer.get("label", answer.get("value"))
+            values.add(answer)
+    return {
+        str(v)
+        for v in values
+        if isinstance(v, str | int | float) and not isinstance(v, bool)
+    }
@@ -3,82 +3,129 @@ import argparse
 import csv
 import json
 import textwrap
-from collections import defaultdict
-from dataclasses import dataclass, field
 from pathlib import Path
 
 import numpy as np
-import numpy.typing as npt
 import pandas as pd
 from tqdm import tqdm
 from util.pylib import log
 
 from finder.pylib import box_calc as calc
-from finder.pylib.const import CLASSES, OTHER, TYPEWRITTEN
+from finder.pylib import reconcile, zooniverse
+from finder.pylib.box_store import BoxStore, BoxStoreBuilder
+from finder.pylib.const import OTHER, TYPEWRITTEN
 
-
-@dataclass
-class Sheet:
-    boxes: np.ndarray = field(default_factory=lambda: np.empty((0, 4), dtype=np.int32))
-    types: np.ndarray = field(default_factory=lambda: np.array([], dtype=np.str_))
-
-    @staticmethod
-    def bbox_from_json(coords: str) -> npt.ArrayLike:
-        raw = json.loads(coords)
-        box = np.array([raw["left"], raw["top"], raw["right"], raw["bottom"]])
-        return box
+STORE_SUFFIXES = (".arrow", ".parquet")
 
 
 def main():
     log.started()
     args = parse_args()
 
-    sheets = get_sheet_boxes(
-        args.unreconciled, args.sheet_column, args.box_columns, args.class_columns
-    )
+    if args.classifications:
+        sheets = get_classification_boxes(
+            args.classifications,
+            args.workflow_id,
+            args.subject_field,
+            args.typewritten_value,
+        )
+    elif args.unreconciled.suffix in STORE_SUFFIXES:
+        sheets = BoxStore.load(args.unreconciled)
+    else:
+        sheets = get_sheet_boxes(
+            args.unreconciled, args.sheet_column, args.box_columns, args.class_columns
+        )
+
+    if args.box_store:
+        sheets.save(args.box_store)
 
     if args.limit:
-        sheets = dict(list(sheets.items())[: args.limit])
-
-    reconciled = []
+        sheets = sheets.head(args.limit)
+
+    expand_by = read_manifest(args.manifest) if args.manifest else {}
+
+    if args.sweep:
+        sweep(sheets, args, expand_by)
+        log.finished()
+        return
+
+    if args.state:
+        reconciled, digests = reconcile.update(
+            tqdm(sheets.items(), total=len(sheets)),
+            args.state,
+            args.iou_threshold,
+            args.expand_by,
+            expand_by,
+        )
+    else:
+        reconciled, digests = [], {}
+        for sheet_id, boxes, classes in tqdm(sheets.items(), total=len(sheets)):
+            groups = calc.find_box_groups(boxes, args.iou_threshold)
+            reconciled += reconcile.reconcile_sheet(
+                sheet_id,
+                boxes,
+                classes,
+                groups,
+                expand_by.get(sheet_id, args.expand_by),
+            )
+
+    reconcile.save(args.reconciled, reconciled, args.state, digests)
 
-    for sheet_id, sheet in tqdm(sheets.items()):
-        groups = calc.find_box_groups(sheet.boxes, args.iou_threshold)
-
-        for grp in np.unique(groups):
-            label = {"sheet": sheet_id}
-            label |= merge_boxes(sheet.boxes[groups == grp], args.expand_by)
-            label |= merge_types(sheet.types[groups == grp])
+    log.finished()
 
-            reconciled.append(label)
 
-    df = pd.DataFrame(reconciled)
+def sweep(sheets, args, expand_by):
+    """Reconcile the sheets for every IoU threshold in one pass."""
+    thresholds = sorted(set(args.sweep))
+    reconciled = {t: [] for t in thresholds}
+    single_box = dict.fromkeys(thresholds, 0)
+
+    for sheet_id, boxes, classes in tqdm(sheets.items(), total=len(sheets)):
+        all_groups = calc.find_box_groups_sweep(boxes, thresholds)
+
+        for threshold, groups in all_groups.items():
+            reconciled[threshold] += reconcile.reconcile_sheet(
+                sheet_id,
+                boxes,
+                classes,
+                groups,
+                expand_by.get(sheet_id, args.expand_by),
+            )
+            _, counts = np.unique(groups, return_counts=True)
+            single_box[threshold] += int(np.sum(counts == 1))
+
+    report = []
+    for threshold in thresholds:
+        path = args.reconciled.with_stem(f"{args.reconciled.stem}_iou_{threshold}")
+        df = pd.DataFrame(reconciled[threshold])
+        df.to_csv(path, index=False)
+        report.append(
+            {
+                "iou_threshold": threshold,
+                "labels": len(reconciled[threshold]),
+                "single_box_labels": single_box[threshold],
+                "reconciled": str(path),
+            }
+        )
+
+    df = pd.DataFrame(report)
     df.to_csv(args.reconciled, index=False)
 
-    log.finished()
-
 
-def merge_boxes(boxes: npt.NDArray, expand_by) -> dict[str, float]:
-    """Get the outside dimensions of the boxes."""
-    return {
-        "left": np.min(boxes[:, 0]) * expand_by,
-        "top": np.min(boxes[:, 1]) * expand_by,
-        "right": np.max(boxes[:, 2]) * expand_by,
-        "bottom": np.max(boxes[:, 3]) * expand_by,
-    }
+def read_manifest(manifest) -> dict[str, int]:
+    """Get how much build-expedition reduced each sheet."""
+    with manifest.open() as csv_file:
+        reader = csv.DictReader(csv_file)
+        return {r["Filename"]: int(r["reduced_by"]) for r in reader}
 
 
-def merge_types(types: npt.ArrayLike) -> dict[str, str]:
-    """Get the most common type."""
-    counts = {c: 0 for c in CLASSES}
-    for val in types:
-        counts[val] += 1
-    cls: str = OTHER if counts[OTHER] > counts[TYPEWRITTEN] else TYPEWRITTEN
-    return {"class": cls}
+def bbox_from_json(coords: str) -> list[float]:
+    raw = json.loads(coords)
+    return [raw["left"], raw["top"], raw["right"], raw["bottom"]]
 
 
 def get_sheet_boxes(unreconciled, sheet_column, box_columns, class_columns):
-    sheets = defaultdict(Sheet)
+    sheets = BoxStoreBuilder()
 
     with unreconciled.open() as unrec:
         reader = csv.DictReader(unrec)
@@ -86,17 +133,36 @@ def get_sheet_boxes(unreconciled, sheet_column, box_columns, class_columns):
             sheet_id = row[sheet_column]
 
             coords = [v for k, v in row.items() if k.startswith(box_columns)]
-            boxes = np.array([Sheet.bbox_from_json(c) for c in coords if c])
+            boxes = [bbox_from_json(c) for c in coords if c]
             if len(boxes) == 0:
                 continue
 
-            sheets[sheet_id].boxes = np.vstack((sheets[sheet_id].boxes, boxes))
-
             types = [v for k, v in row.items() if k.startswith(class_columns)]
+            types += [OTHER] * (len(boxes) - len(types))
             types = [v if v == TYPEWRITTEN else OTHER for v in types[: len(boxes)]]
-            sheets[sheet_id].types = np.hstack((sheets[sheet_id].types, types))
 
-    return sheets
+            sheets.add(sheet_id, boxes, types)
+
+    return sheets.build()
+
+
+def get_classification_boxes(export, workflow_id, subject_field, typewritten):
+    sheets = BoxStoreBuilder()
+
+    classifications = zooniverse.read_classifications(
+        export,
+        workflow_id=workflow_id,
+        subject_field=subject_field,
+        typewritten=tuple(typewritten),
+    )
+
+    for classification in classifications:
+        if classification.boxes:
+            sheets.add(
+                classification.sheet_id, classification.boxes, classification.classes
+            )
+
+    return sheets.build()
 
 
 def parse_args() -> argparse.Namespace:
@@ -116,13 +182,32 @@ def parse_args() -> argparse.Namespace:
         ),
     )
 
-    arg_parser.add_argument(
+    volunteer_boxes = arg_parser.add_mutually_exclusive_group(required=True)
+
+    volunteer_boxes.add_argument(
         "--unreconciled",
-        required=True,
         type=Path,
         metavar="PATH",
         help="""Get volunteer drawn labels from this CSV file. This is the CSV file
-            gotten from the label_reconciliations.py script's --unreconciled option.""",
+            gotten from the label_reconciliations.py script's --unreconciled option.
+            It may also be a box store saved with --box-store.""",
+    )
+
+    volunteer_boxes.add_argument(
+        "--classifications",
+        type=Path,
+        metavar="PATH",
+        help="""Get volunteer drawn labels directly from this raw Zooniverse
+            classifications export. This skips the label_reconciliations.py step.""",
+    )
+
+    arg_parser.add_argument(
+        "--box-store",
+        type=Path,
+        metavar="PATH",
+        help="""Save the volunteer drawn boxes to this Arrow (.arrow) or Parquet
+            (.parquet) file. Later runs can read it with --unreconciled, which is much
+            faster than parsing the CSV file. Arrow files are memory mapped.""",
     )
 
     arg_parser.add_argument(
@@ -133,6 +218,15 @@ def parse_args() -> argparse.Namespace:
         help="""Write reconciled labels to this CSV file.""",
     )
 
+    arg_parser.add_argument(
+        "--state",
+        type=Path,
+        metavar="DIR",
+        help="""Keep the labels and a digest of every sheet's boxes in this
+            directory. On later runs only the sheets whose boxes changed are
+            reconciled again, and the other sheets reuse their labels from here.""",
+    )
+
     arg_parser.add_argument(
         "--expand-by",
         type=int,
@@ -143,6 +237,14 @@ def parse_args() -> argparse.Namespace:
             to the original size. (default: %(default)s)""",
     )
 
+    arg_parser.add_argument(
+        "--manifest",
+        type=Path,
+        metavar="PATH",
+        help="""Expand each sheet by its own factor given in this manifest.csv from
+            build-expedition. Sheets missing from the manifest use --expand-by.""",
+    )
+
     arg_parser.add_argument(
         "--iou-threshold",
         type=float,
@@ -152,6 +254,18 @@ def parse_args() -> argparse.Namespace:
             means fewer boxes will match. (default: %(default)s)""",
     )
 
+    arg_parser.add_argument(
+        "--sweep",
+        type=float,
+        nargs="+",
+        metavar="IOU",
+        help="""Reconcile the labels for each of these IoU thresholds in a single
+            pass, instead of using --iou-threshold. The labels for each threshold are
+            written next to the --reconciled file with the threshold added to the
+            file name, and --reconciled gets a report of the label counts for every
+            threshold.""",
+    )
+
     arg_parser.add_argument(
         "--sheet-column",
         metavar="NAME",
@@ -176,6 +290,30 @@ def parse_args() -> argparse.Namespace:
             (default: %(default)s)""",
     )
 
+    arg_parser.add_argument(
+        "--workflow-id",
+        metavar="ID",
+        help="""Only use --classifications rows from this workflow.""",
+    )
+
+    arg_parser.add_argument(
+        "--subject-field",
+        metavar="NAME",
+        default="Filename",
+        help="""The sheet image file name is in this field of the --classifications
+            subject data. (default: %(default)s)""",
+    )
+
+    arg_parser.add_argument(
+        "--typewritten-value",
+        metavar="VALUE",
+        nargs="+",
+        default=[TYPEWRITTEN],
+        help="""A --classifications box is typewritten if its tool label or one
+            of its answers is one of these values. All other boxes are "Other".
+            (default: %(default)s)""",
+    )
+
     arg_parser.add_argument(
         "--limit",
         type=int,
@@ -183,6 +321,10 @@ def parse_args() -> argparse.Namespace:
     )
 
     args = arg_parser.parse_args()
+
+    if args.state and args.sweep:
+        arg_parser.error("--state cannot be used with --sweep")
+
     return args
 
 
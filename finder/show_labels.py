@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+import argparse
+import csv
+import logging
+import os
+import textwrap
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from tqdm import tqdm
+from util.pylib import log
+
+from finder.pylib import const, overlay, storage
+
+
+def main():
+    log.started()
+    args = parse_args()
+
+    if args.yolo_results_dir:
+        labels = read_yolo_results(args.yolo_results_dir)
+    else:
+        labels = read_reconciled(args.reconciled)
+
+    sheets = storage.get_storage(args.sheet_dir)
+    sheet_names = {storage.stem(n): n for n in sheets.list()}
+
+    stems = sorted(s for s in labels if s in sheet_names)
+    msg = f"Showing labels on {len(stems)} of {len(labels)} sheets"
+    logging.info(msg)
+
+    workers = args.workers or os.cpu_count()
+
+    with (
+        sheets,
+        storage.get_storage(args.output_dir) as output,
+        ProcessPoolExecutor(workers) as executor,
+    ):
+        page = Page(output, args)
+
+        # Keep a bounded number of sheets in flight
+        jobs = deque()
+        blobs = sheets.prefetch(sheet_names[s] for s in stems)
+        for blob in tqdm(blobs, total=len(stems)):
+            boxes, classes = labels[blob.stem]
+            future = executor.submit(
+                overlay.render_sheet,
+                blob,
+                np.array(boxes),
+                classes,
+                fractional=bool(args.yolo_results_dir),
+                reduce_by=args.reduce_by,
+            )
+            jobs.append((blob.name, future))
+            if len(jobs) >= 2 * workers:
+                page.add(*jobs.popleft())
+
+        while jobs:
+            page.add(*jobs.popleft())
+
+        page.flush()
+
+    log.finished()
+
+
+class Page:
+    """Save overlays one at a time or gather them into contact sheets."""
+
+    def __init__(self, output, args):
+        self.output = output
+        self.mosaic = args.mosaic
+        self.columns = args.columns
+        self.cell_height = args.cell_height
+        self.images = []
+        self.names = []
+        self.count = 0
+
+    def add(self, name, future):
+        image = future.result()
+        if image is None:
+            return
+
+        if not self.mosaic:
+            self.output.save_image(name, image)
+            return
+
+        self.images.append(image)
+        self.names.append(name)
+        if len(self.images) >= self.mosaic:
+            self.flush()
+
+    def flush(self):
+        if not self.images:
+            return
+        self.count += 1
+        image = overlay.mosaic(self.images, self.names, self.columns, self.cell_height)
+        self.output.save_image(f"mosaic_{self.count:05d}.jpg", image)
+        self.images, self.names = [], []
+
+
+def read_yolo_results(yolo_results_dir) -> dict[str, tuple[list, list]]:
+    """Get YOLO boxes as fractions of the sheet size."""
+    labels = {}
+    for path in sorted(yolo_results_dir.glob("*.txt")):
+        boxes, classes = [], []
+        with path.open() as lb:
+            for ln in lb:
+                cls, center_x, center_y, width, height, *_ = ln.split()
+                radius_x, radius_y = float(width) / 2, float(height) / 2
+                boxes.append(
+                    [
+                        float(center_x) - radius_x,
+                        float(center_y) - radius_y,
+                        float(center_x) + radius_x,
+                        float(center_y) + radius_y,
+                    ]
+                )
+                classes.append(const.CLASS2NAME[int(cls)])
+        labels[path.stem] = (boxes, classes)
+    return labels
+
+
+def read_reconciled(reconciled) -> dict[str, tuple[list, list]]:
+    """Get reconciled boxes in sheet pixel coordinates."""
+    labels = defaultdict(lambda: ([], []))
+    with reconciled.open() as csv_file:
+        reader = csv.DictReader(csv_file)
+        for row in reader:
+            boxes, classes = labels[storage.stem(row["sheet"])]
+            boxes.append([float(row[k]) for k in ("left", "top", "right", "bottom")])
+            classes.append(row["class"])
+    return labels
+
+
+def parse_args():
+    arg_parser = argparse.ArgumentParser(
+        fromfile_prefix_chars="@",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=textwrap.dedent(
+            """
+            Draw label boxes on shrunken copies of the herbarium sheets so that
+            people can check them quickly. Typewritten labels are outlined in orange
+            and other labels are outlined in teal. The boxes come from either YOLO
+            results or the output of reconcile-expedition.
+            """,
+        ),
+    )
+
+    arg_parser.add_argument(
+        "--sheet-dir",
+        metavar="PATH",
+        required=True,
+        help="""The directory containing all of the original herbarium sheet images.
+            This may also be a zip or tar archive or an S3 URL like
+            s3://bucket/prefix.""",
+    )
+
+    boxes = arg_parser.add_mutually_exclusive_group(required=True)
+
+    boxes.add_argument(
+        "--yolo-results-dir",
+        type=Path,
+        metavar="PATH",
+        help="""Directory containing the label predictions.""",
+    )
+
+    boxes.add_argument(
+        "--reconciled",
+        type=Path,
+        metavar="PATH",
+        help="""A CSV file of labels from reconcile-expedition.""",
+    )
+
+    arg_parser.add_argument(
+        "--output-dir",
+        metavar="PATH",
+        required=True,
+        help="""Save the images to this directory, zip archive, or S3 URL.""",
+    )
+
+    arg_parser.add_argument(
+        "--reduce-by",
+        type=int,
+        default=4,
+        metavar="N",
+        help="""Shrink the sheets by this factor. (default: %(default)s)""",
+    )
+
+    arg_parser.add_argument(
+        "--mosaic",
+        type=int,
+        metavar="N",
+        help="""Tile this many sheets into each output image.""",
+    )
+
+    arg_parser.add_argument(
+        "--columns",
+        type=int,
+        default=6,
+        metavar="N",
+        help="""Mosaics have this many sheets per row. (default: %(default)s)""",
+    )
+
+    arg_parser.add_argument(
+        "--cell-height",
+        type=int,
+        default=400,
+        metavar="PIXELS",
+        help="""Sheets in a mosaic are this high. (default: %(default)s)""",
+    )
+
+    arg_parser.add_argument(
+        "--workers",
+        type=int,
+        metavar="INT",
+        help="""Draw the sheets with this many processes. (default: all CPUs)""",
+    )
+
+    args = arg_parser.parse_args()
+    return args
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+import argparse
+import logging
+import os
+import signal
+import textwrap
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+from pathlib import Path
+
+from PIL import Image
+from util.pylib import log
+
+from finder.pylib import sheet_util, storage
+from finder.pylib.watcher import DirWatcher, ServiceStats, write_stats
+from finder.yolo_results_to_labels import crop_labels
+
+
+def main():
+    log.started()
+    args = parse_args()
+
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+
+    Service(args).run(stop)
+
+    log.finished()
+
+
+class Service:
+    def __init__(self, args):
+        self.args = args
+        self.yolo_images = storage.LocalStorage(args.yolo_images)
+        self.label_dir = None
+        if args.label_dir:
+            self.label_dir = storage.LocalStorage(args.label_dir)
+
+        self.sheet_watcher = DirWatcher(args.sheet_dir, settle=args.settle)
+        self.result_watcher = None
+        if args.yolo_results_dir:
+            self.result_watcher = DirWatcher(
+                args.yolo_results_dir, "*.txt", settle=args.settle
+            )
+
+        self.stats = {"prepare": ServiceStats(), "crop": ServiceStats()}
+        self.sheets = {}  # Sheet stem -> sheet path
+        self.waiting = {}  # Sheet stem -> YOLO results waiting for their sheet
+        self.running = {}  # Future -> (stage, arrival time, file name)
+        self.executor = None
+
+        self.skip_finished()
+
+    def skip_finished(self):
+        """Do not redo the work from an earlier run of the service."""
+        prepared = {storage.stem(n) for n in self.yolo_images.list()}
+        names = [p.name for p in self.args.sheet_dir.iterdir() if p.stem in prepared]
+        self.sheet_watcher.seed(names)
+        self.sheets |= {storage.stem(n): self.args.sheet_dir / n for n in names}
+
+        if self.result_watcher:
+            # Label names are: <sheet stem>_<class>_<left>_<top>_<right>_<bottom>
+            cropped = {n.rsplit("_", 5)[0] for n in self.label_dir.list()}
+            names = [
+                p.name
+                for p in self.args.yolo_results_dir.glob("*.txt")
+                if p.stem in cropped
+            ]
+            self.result_watcher.seed(names)
+
+        msg = f"Skipping {len(self.sheets)} sheets prepared in an earlier run"
+        logging.info(msg)
+
+    def run(self, stop):
+        workers = self.args.workers or os.cpu_count()
+
+        with ProcessPoolExecutor(workers, initializer=init_worker) as executor:
+            self.executor = executor
+
+            # Start every worker now so the first sheets do not pay for it
+            wait([executor.submit(Image.init) for _ in range(workers)])
+            msg = f"Watching {self.args.sheet_dir} with {workers} workers"
+            logging.info(msg)
+
+            while not stop.is_set():
+                self.scan()
+                self.collect(wait(self.running, timeout=0).done)
+                self.write_stats()
+                stop.wait(self.args.poll_interval)
+
+            msg = f"Draining {len(self.running)} queued sheets"
+            logging.info(msg)
+            self.collect(wait(self.running).done)
+            self.write_stats()
+
+    def scan(self):
+        for path, arrived in self.sheet_watcher.scan():
+            self.sheets[path.stem] = path
+            self.submit(
+                "prepare",
+                arrived,
+                path.name,
+                sheet_util.to_yolo_image,
+                path,
+                self.yolo_images,
+                self.args.yolo_size,
+            )
+
+            if path.stem in self.waiting:
+                self.crop(*self.waiting.pop(path.stem))
+
+        if self.result_watcher:
+            for path, arrived in self.result_watcher.scan():
+                self.crop(path, arrived)
+
+    def crop(self, result_path, arrived):
+        sheet_path = self.sheets.get(result_path.stem)
+        if not sheet_path:
+            self.waiting[result_path.stem] = (result_path, arrived)
+            return
+        self.submit(
+            "crop",
+            arrived,
+            result_path.name,
+            crop_labels,
+            sheet_path,
+            result_path,
+            self.label_dir,
+        )
+
+    def submit(self, stage, arrived, name, func, *args):
+        future = self.executor.submit(func, *args)
+        self.running[future] = (stage, arrived, name)
+        self.stats[stage].add()
+
+    def collect(self, done):
+        for future in done:
+            stage, arrived, name = self.running.pop(future)
+            ok = future.exception() is None and future.result() is not None
+            if future.exception():
+                msg = f"Could not {stage} {name}: {future.exception()}"
+                logging.error(msg)
+            self.stats[stage].finish(arrived, ok=ok)
+
+    def write_stats(self):
+        if self.args.stats_file:
+            write_stats(self.args.stats_file, self.stats)
+
+
+def init_worker():
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # The service handles shutdown
+    Image.init()
+
+
+def parse_args():
+    arg_parser = argparse.ArgumentParser(
+        fromfile_prefix_chars="@",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=textwrap.dedent(
+            """
+            Watch for new herbarium sheets and prepare them for YOLO as soon as they
+            arrive. If given YOLO results, labels are cut out of the sheets as soon as
+            the results arrive.
+
+            Stop the service with Ctrl-C or SIGTERM, it will finish the sheets already
+            queued before exiting.
+            """,
+        ),
+    )
+
+    arg_parser.add_argument(
+        "--sheet-dir",
+        type=Path,
+        metavar="PATH",
+        required=True,
+        help="""Watch this directory for new sheet images.""",
+    )
+
+    arg_parser.add_argument(
+        "--yolo-images",
+        type=Path,
+        metavar="PATH",
+        required=True,
+        help="""Save YOLO formatted images to this directory.""",
+    )
+
+    arg_parser.add_argument(
+        "--yolo-size",
+        type=int,
+        metavar="INT",
+        default=640,
+        help="""Resize images to this height & width in pixels. This must match the
+            the image size used to train the model. (default: %(default)s)""",
+    )
+
+    arg_parser.add_argument(
+        "--yolo-results-dir",
+        type=Path,
+        metavar="PATH",
+        help="""Watch this directory for new YOLO label predictions.""",
+    )
+
+    arg_parser.add_argument(
+        "--label-dir",
+        type=Path,
+        metavar="PATH",
+        help="""Output the label images to this directory.""",
+    )
+
+    arg_parser.add_argument(
+        "--workers",
+        type=int,
+        metavar="INT",
+        help="""Keep this many worker processes. (default: all CPUs)""",
+    )
+
+    arg_parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=1.0,
+        metavar="SECONDS",
+        help="""Look for new files this often. (default: %(default)s)""",
+    )
+
+    arg_parser.add_argument(
+        "--settle",
+        type=float,
+        default=2.0,
+        metavar="SECONDS",
+        help="""A file is complete when it has not changed for this long.
+            (default: %(default)s)""",
+    )
+
+    arg_parser.add_argument(
+        "--stats-file",
+        type=Path,
+        metavar="PATH",
+        help="""Keep queue depth and latency statistics in this JSON file.""",
+    )
+
+    args = arg_parser.parse_args()
+
+    if args.yolo_results_dir and not args.label_dir:
+        arg_parser.error("--yolo-results-dir requires --label-dir")
+
+    return args
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,48 @@
 #!/usr/bin/env python3
 import argparse
 import textwrap
+from contextlib import nullcontext
 from pathlib import Path
 
 from tqdm import tqdm
 from util.pylib import log
 
-from finder.pylib import sheet_util
+from finder.pylib import dedup, sheet_util, storage, tiling
 
 
 def main():
     log.started()
     args = parse_args()
 
-    args.yolo_images.mkdir(exist_ok=True, parents=True)
+    sheets = storage.get_storage(args.sheet_dir)
+    names = sheets.list()
+
+    if args.duplicate_csv:
+        duplicates = dedup.read_duplicates(args.duplicate_csv)
+        names = [n for n in names if is_representative(n, duplicates)]
+
+    with (
+        sheets,
+        storage.get_storage(args.yolo_images) as yolo_images,
+        tiling.open_index(args.tile_index)
+        if args.tile_size
+        else nullcontext() as index,
+    ):
+        for blob in tqdm(sheets.prefetch(names), total=len(names)):
+            if args.tile_size:
+                rows = tiling.to_yolo_tiles(
+                    blob, yolo_images, args.tile_size, args.tile_overlap
+                )
+                index.writerows(rows)
+            else:
+                sheet_util.to_yolo_image(blob, yolo_images, args.yolo_size)
 
-    sheets = list(args.sheet_dir.glob("*"))
+    log.finished()
 
-    for path in tqdm(sheets):
-        sheet_util.to_yolo_image(path, args.yolo_images, args.yolo_size)
 
-    log.finished()
+def is_representative(name, duplicates) -> bool:
+    stem = storage.stem(name)
+    return duplicates.get(stem, stem) == stem
 
 
 def parse_args():
@@ -38,19 +60,19 @@ def parse_args():
 
     arg_parser.add_argument(
         "--sheet-dir",
-        type=Path,
         metavar="PATH",
         required=True,
         help="""A CSV file containing all of the herbarium sheets paths to feed to the
-            YOLO model.""",
+            YOLO model. This may also be a zip or tar archive or an S3 URL like
+            s3://bucket/prefix.""",
     )
 
     arg_parser.add_argument(
         "--yolo-images",
-        type=Path,
         metavar="PATH",
         required=True,
-        help="""Save YOLO formatted images to this directory.""",
+        help="""Save YOLO formatted images to this directory, zip archive, or S3
+            URL.""",
     )
 
     arg_parser.add_argument(
@@ -62,7 +84,47 @@ def parse_args():
             the image size used to train the model. (default: %(default)s)""",
     )
 
+    arg_parser.add_argument(
+        "--duplicate-csv",
+        type=Path,
+        metavar="PATH",
+        help="""Only prepare one sheet per cluster of duplicate sheets. This is the
+            CSV file from the find-duplicate-sheets script.""",
+    )
+
+    arg_parser.add_argument(
+        "--tile-size",
+        type=int,
+        metavar="INT",
+        help="""Instead of shrinking each sheet to --yolo-size, cut it into
+            overlapping square tiles of this many pixels at full resolution. Use
+            merge-yolo-tiles to put the YOLO results back together.""",
+    )
+
+    arg_parser.add_argument(
+        "--tile-overlap",
+        type=int,
+        metavar="INT",
+        default=128,
+        help="""Neighboring tiles overlap by this many pixels. It should be
+            about the size of a small label. (default: %(default)s)""",
+    )
+
+    arg_parser.add_argument(
+        "--tile-index",
+        type=Path,
+        metavar="PATH",
+        help="""Write the sheet and position of every tile to this CSV file.""",
+    )
+
     args = arg_parser.parse_args()
+
+    if args.tile_size and not args.tile_index:
+        arg_parser.error("--tile-size requires --tile-index")
+
+    if args.tile_size and not 0 <= args.tile_overlap < args.tile_size:
+        arg_parser.error("--tile-overlap must be smaller than --tile-size")
+
     return args
 
 
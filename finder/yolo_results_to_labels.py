@@ -7,7 +7,8 @@ from pathlib import Path
 from tqdm import tqdm
 from util.pylib import log
 
-from finder.pylib import const, sheet_util
+from finder.pylib import const, dedup, sheet_util, storage
+from finder.pylib.catalog import Catalog
 
 
 def main():
@@ -18,48 +19,93 @@ def main():
 
 
 def to_labels(args):
-    args.label_dir.mkdir(exist_ok=True, parents=True)
-
-    sheet_paths = {p.stem: p for p in args.sheet_dir.glob("*")}
+    sheets = storage.get_storage(args.sheet_dir)
+
+    sizes = {}  # Sheet sizes from the catalog headers
+    if args.catalog:
+        with Catalog(args.catalog) as catalog:
+            catalog.update(args.sheet_dir)
+            infos = catalog.stems(args.sheet_dir)
+        # Plan around sheets with unreadable headers before fetching anything
+        bad = [k for k, v in infos.items() if v.size is None]
+        if bad:
+            msg = f"Skipping {len(bad)} sheets with unreadable image headers"
+            logging.warning(msg)
+        sheet_names = {k: v.name for k, v in infos.items() if v.size is not None}
+        sizes = {v.name: v.size for v in infos.values()}
+    else:
+        sheet_names = {storage.stem(n): n for n in sheets.list()}
 
     label_paths = sorted(args.yolo_results_dir.glob("*.txt"))
 
+    # Pair each sheet stem with its YOLO results
+    results = [(p.stem, p) for p in label_paths]
+
+    if args.duplicate_csv:
+        # Duplicate sheets get the YOLO results of their cluster's representative
+        by_stem = dict(results)
+        duplicates = dedup.read_duplicates(args.duplicate_csv)
+        results += [
+            (stem, by_stem[rep])
+            for stem, rep in duplicates.items()
+            if stem != rep and rep in by_stem
+        ]
+
     msg = (
-        f"Number of herbarium sheets = {len(sheet_paths)} "
+        f"Number of herbarium sheets = {len(sheet_names)} "
         f"Number of YOLO result files = {len(label_paths)}"
     )
     logging.info(msg)
 
-    for label_path in tqdm(label_paths):
-        sheet_path = sheet_paths.get(label_path.stem)
-        if not sheet_path:
-            continue
+    results = [(sheet_names[s], p) for s, p in results if s in sheet_names]
+
+    with sheets, storage.get_storage(args.label_dir) as label_dir:
+        blobs = sheets.prefetch(n for n, _ in results)
+
+        for blob, (_, label_path) in tqdm(
+            zip(blobs, results, strict=True), total=len(results)
+        ):
+            crop_labels(blob, label_path, label_dir, sizes.get(blob.name))
+
 
-        sheet_image = sheet_util.get_sheet_image(sheet_path)
+def crop_labels(sheet_path, label_path, label_dir, sheet_size=None) -> int:
+    """
+    Cut the labels found by YOLO out of a sheet and return how many there were.
 
-        with label_path.open() as lb:
-            lines = lb.readlines()
+    The sheet size is taken from the sheet's image header unless it is given.
+    """
+    with label_path.open() as lb:
+        lines = lb.readlines()
 
-        stem = label_path.stem
+    if not lines:
+        return 0
 
-        for ln in lines:
-            cls, left, top, right, bottom = from_yolo_format(ln, sheet_image)
+    sheet = sheet_util.get_lazy_sheet(sheet_path)
+    if not sheet:
+        return 0
 
-            name = "_".join([stem, cls, str(left), str(top), str(right), str(bottom)])
-            name += sheet_path.suffix
+    for ln in lines:
+        cls, left, top, right, bottom = from_yolo_format(ln, sheet_size or sheet.size)
 
-            label_image = sheet_image.crop((left, top, right, bottom))
-            label_image.save(args.label_dir / name)
+        name = "_".join(
+            [sheet_path.stem, cls, str(left), str(top), str(right), str(bottom)]
+        )
+        name += sheet_path.suffix
 
+        label_image = sheet.read_region((left, top, right, bottom))
+        label_dir.save_image(name, label_image)
 
-def from_yolo_format(ln, sheet_image):
+    return len(lines)
+
+
+def from_yolo_format(ln, sheet_size):
     """Convert YOLO coordinates to image coordinates."""
     cls, center_x, center_y, width, height, *_ = ln.split()
 
     cls = const.CLASS2NAME[int(cls)]
 
     # Scale from fractional to sheet image size
-    sheet_width, sheet_height = sheet_image.size
+    sheet_width, sheet_height = sheet_size
     center_x = float(center_x) * sheet_width
     center_y = float(center_y) * sheet_height
     radius_x = float(width) * sheet_width / 2
@@ -93,22 +139,43 @@ def parse_args():
 
     arg_parser.add_argument(
         "--sheet-dir",
-        type=Path,
         metavar="PATH",
         required=True,
-        help="""The directory containing all of the original herbarium sheet images.""",
+        help="""The directory containing all of the original herbarium sheet images.
+            This may also be a zip or tar archive or an S3 URL like
+            s3://bucket/prefix.""",
     )
 
     arg_parser.add_argument(
         "--label-dir",
-        type=Path,
         metavar="PATH",
         required=True,
-        help="""Output the label images to this directory.""",
+        help="""Output the label images to this directory, zip archive, or S3
+            URL.""",
+    )
+
+    arg_parser.add_argument(
+        "--duplicate-csv",
+        type=Path,
+        metavar="PATH",
+        help="""Copy the YOLO results of each cluster's representative sheet to its
+            duplicate sheets. This is the CSV file from the find-duplicate-sheets
+            script.""",
+    )
+
+    arg_parser.add_argument(
+        "--catalog",
+        type=Path,
+        metavar="PATH",
+        help="""Update this sheet catalog and use it to find the sheets. This needs a
+            local --sheet-dir. See the catalog-sheets script.""",
     )
 
     args = arg_parser.parse_args()
 
+    if args.catalog and not Path(args.sheet_dir).is_dir():
+        arg_parser.error("--catalog needs a local --sheet-dir")
+
     return args
 
 
@@ -1,59 +1,85 @@
 #!/usr/bin/env python3
 import argparse
 import csv
+import logging
 import textwrap
-from collections import defaultdict
+from contextlib import nullcontext
 from pathlib import Path
 
 import numpy as np
 from tqdm import tqdm
 from util.pylib import log
 
-from finder.pylib import const, sheet_util
+from finder.pylib import sheet_util, storage
+from finder.pylib.box_store import BoxStore, BoxStoreBuilder
+from finder.pylib.catalog import Catalog
 
 
 def main():
     log.started()
     args = parse_args()
 
-    args.yolo_images.mkdir(exist_ok=True)
     args.yolo_labels.mkdir(exist_ok=True)
 
     sheets = get_sheets(args.label_csv)
 
-    for path, labels in tqdm(sheets.items()):
-        path = Path(path)
-        image_size = sheet_util.to_yolo_image(path, args.yolo_images, args.image_size)
-        if image_size is not None:
-            write_labels(args.yolo_labels, labels, image_size)
+    with (
+        Catalog(args.catalog) if args.catalog else nullcontext() as catalog,
+        storage.get_storage(args.yolo_images) as yolo_images,
+    ):
+        for path, size, boxes, classes in tqdm(
+            plan(sheets, catalog), total=len(sheets)
+        ):
+            image_size = sheet_util.to_yolo_image(path, yolo_images, args.yolo_size)
+            if image_size is not None:
+                text_path = args.yolo_labels / f"{path.stem}.txt"
+                write_labels(text_path, boxes, classes, size or image_size)
 
     log.finished()
 
 
-def get_sheets(label_csv) -> dict[str, list[dict]]:
+def plan(sheets: BoxStore, catalog):
+    """
+    Get the sheets to prepare with their sizes.
+
+    With a catalog, sheets are found by their stem because the CSV may hold paths
+    from another machine, and their sizes come from the catalog. Sheets that are
+    missing or have unreadable image headers are skipped before any image is
+    decoded.
+    """
+    for path, boxes, classes in sheets.items():
+        path, size = Path(path), None
+
+        if catalog:
+            info = catalog.by_stem(path.stem)
+            if not info or info.size is None:
+                msg = f"{path.stem} is not in the catalog or is not an image"
+                logging.warning(msg)
+                continue
+            path, size = Path(info.path), info.size
+
+        yield path, size, boxes, classes
+
+
+def get_sheets(label_csv) -> BoxStore:
     with label_csv.open() as csv_file:
         reader = csv.DictReader(csv_file)
-        sheets = defaultdict(list)
+        sheets = BoxStoreBuilder()
         for label in reader:
-            stem = Path(label["path"]).stem
+            path = label["path"]
             if label["class"]:
-                sheets[stem].append(label)
-            elif stem not in sheets:
-                sheets[stem] = []
-    return sheets
+                box = [label["left"], label["top"], label["right"], label["bottom"]]
+                sheets.add(path, [box], [label["class"]])
+            else:
+                sheets.add_sheet(path)
+    return sheets.build()
 
 
-def write_labels(text_path, labels, image_size):
-    classes = [lb["class"] for lb in labels]
-    boxes = np.array(
-        [[lb["left"], lb["top"], lb["right"], lb["bottom"]] for lb in labels],
-        dtype=np.float64,
-    )
+def write_labels(text_path, boxes, classes, image_size):
     width, height = image_size
-    boxes = to_yolo_format(boxes, width, height)
+    boxes = to_yolo_format(boxes.astype(np.float64), width, height)
     with text_path.open("w") as txt_file:
         for label_class, box in zip(classes, boxes, strict=False):
-            label_class = const.CLASS2INT[label_class]
             bbox = np.array2string(box, formatter={"float_kind": lambda x: "%.6f" % x})
             line = f"{label_class} {bbox[1:-1]}\n"
             txt_file.write(line)
@@ -107,10 +133,10 @@ def parse_args():
 
     arg_parser.add_argument(
         "--yolo-images",
-        type=Path,
         metavar="PATH",
         required=True,
-        help="""Save YOLO formatted images to this directory.""",
+        help="""Save YOLO formatted images to this directory, zip archive, or S3
+            URL.""",
     )
 
     arg_parser.add_argument(
@@ -130,6 +156,14 @@ def parse_args():
             (default: %(default)s)""",
     )
 
+    arg_parser.add_argument(
+        "--catalog",
+        type=Path,
+        metavar="PATH",
+        help="""Find the sheets by their file name stem in this sheet catalog instead
+            of using the paths in the --label-csv. See the catalog-sheets script.""",
+    )
+
     args = arg_parser.parse_args()
     return args
 
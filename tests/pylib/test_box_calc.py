@@ -61,3 +61,44 @@ class TestBoxCalc(unittest.TestCase):
             ]
         )
         npt.assert_array_equal(calc.find_box_groups(boxes, 0.5), [1, 2, 2, 1, 2])
+
+    def test_box_overlaps_01(self):
+        """It only returns intersecting pairs."""
+        boxes = np.array(
+            [
+                [0, 0, 10, 10],
+                [5, 0, 15, 10],
+                [50, 50, 60, 60],
+            ]
+        )
+        first, second, iou = calc.box_overlaps(boxes)
+        npt.assert_array_equal(first, [0])
+        npt.assert_array_equal(second, [1])
+        npt.assert_array_almost_equal(iou, [50 / 150])
+
+    def test_find_box_groups_sweep_01(self):
+        """It matches find_box_groups for every threshold."""
+        rng = np.random.default_rng(42)
+        thresholds = [0.1, 0.3, 0.5, 0.8]
+        for _ in range(100):
+            corners = rng.integers(0, 200, (20, 2))
+            boxes = np.hstack((corners, corners + rng.integers(1, 80, (20, 2))))
+            groups = calc.find_box_groups_sweep(boxes, thresholds)
+            for threshold in thresholds:
+                npt.assert_array_equal(
+                    groups[threshold], calc.find_box_groups(boxes, threshold)
+                )
+
+    def test_find_box_groups_06(self):
+        """It searches boxes found by different boxes in the same pass."""
+        boxes = np.array(
+            [
+                [100, 0, 200, 101],  # Seed
+                [140, 0, 240, 100],  # Found by the seed
+                [60, 0, 160, 100],  # Found by the seed
+                [180, 0, 280, 100],  # Found by the 2nd box
+                [20, 0, 120, 100],  # Found by the 3rd box
+                [220, 0, 320, 100],  # Found by the 4th box
+            ]
+        )
+        npt.assert_array_equal(calc.find_box_groups(boxes, 0.3), [1, 1, 1, 1, 1, 1])
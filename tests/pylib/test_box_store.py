@@ -0,0 +1,53 @@
+"""Test the columnar box store."""
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import numpy.testing as npt
+
+from finder.pylib.box_store import BoxStore, BoxStoreBuilder
+
+
+class TestBoxStore(unittest.TestCase):
+    def setUp(self):
+        builder = BoxStoreBuilder()
+        builder.add("a", [[1, 2, 3, 4.6]], ["Other"])
+        builder.add("b", [[5, 6, 7, 8], [9, 9, 9, 9]], ["Typewritten", "Other"])
+        builder.add("a", [[0, 0, 1, 1]], [1])
+        builder.add_sheet("c")
+        self.store = builder.build()
+
+    def test_build_01(self):
+        """It groups boxes by sheet in the order they were added."""
+        self.assertEqual(self.store.sheets, ["a", "b", "c"])
+        npt.assert_array_equal(self.store.offsets, [0, 2, 4, 4])
+        boxes, classes = self.store.get("a")
+        npt.assert_array_equal(boxes, [[1, 2, 3, 5], [0, 0, 1, 1]])
+        npt.assert_array_equal(classes, [0, 1])
+        self.assertEqual(boxes.dtype, np.int32)
+        self.assertEqual(classes.dtype, np.int8)
+
+    def test_build_02(self):
+        """It keeps sheets without boxes."""
+        boxes, classes = self.store.get("c")
+        self.assertEqual(boxes.shape, (0, 4))
+        self.assertEqual(len(classes), 0)
+
+    def test_head_01(self):
+        """It slices off the first sheets."""
+        head = self.store.head(2)
+        self.assertEqual(head.sheets, ["a", "b"])
+        self.assertEqual(len(head.boxes), 4)
+
+    def test_save_01(self):
+        """It round trips through Arrow and Parquet files."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for name in ("boxes.arrow", "boxes.parquet"):
+                path = Path(temp_dir) / name
+                self.store.save(path)
+                loaded = BoxStore.load(path)
+                self.assertEqual(loaded.sheets, self.store.sheets)
+                npt.assert_array_equal(loaded.offsets, self.store.offsets)
+                npt.assert_array_equal(loaded.boxes, self.store.boxes)
+                npt.assert_array_equal(loaded.classes, self.store.classes)
@@ -0,0 +1,50 @@
+"""Test the sheet catalog."""
+import tempfile
+import unittest
+from pathlib import Path
+
+from PIL import Image
+
+from finder.pylib.catalog import Catalog, read_header
+
+
+class TestCatalog(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.dir = Path(self.temp_dir.name)
+        self.sheet_dir = self.dir / "sheets"
+        self.sheet_dir.mkdir()
+        Image.new("RGB", (30, 20)).save(self.sheet_dir / "a.jpg")
+        Image.new("RGB", (40, 50)).save(self.sheet_dir / "b.png")
+        self.catalog = Catalog(self.dir / "catalog.db")
+
+    def tearDown(self):
+        self.catalog.close()
+        self.temp_dir.cleanup()
+
+    def test_update_01(self):
+        """It catalogs sheet sizes and formats."""
+        self.assertEqual(self.catalog.update(self.sheet_dir, workers=1), 2)
+        sheet = self.catalog.by_stem("b")
+        self.assertEqual(sheet.size, (40, 50))
+        self.assertEqual(sheet.format, "PNG")
+        self.assertEqual(sheet.name, "b.png")
+
+    def test_update_02(self):
+        """It only rereads changed sheets and drops deleted ones."""
+        self.catalog.update(self.sheet_dir, workers=1)
+        (self.sheet_dir / "a.jpg").unlink()
+        Image.new("RGB", (60, 70)).save(self.sheet_dir / "c.jpg")
+        self.assertEqual(self.catalog.update(self.sheet_dir, workers=1), 1)
+        self.assertEqual(sorted(self.catalog.stems(self.sheet_dir)), ["b", "c"])
+
+    def test_update_03(self):
+        """It keeps files that are not images."""
+        (self.sheet_dir / "notes.txt").write_text("not an image")
+        self.catalog.update(self.sheet_dir, workers=1)
+        self.assertIsNone(self.catalog.by_stem("notes").size)
+
+    def test_read_header_01(self):
+        """It skips sheets that cannot be read."""
+        with self.assertLogs(level="WARNING"):
+            self.assertIsNone(read_header(self.sheet_dir / "gone.jpg"))
@@ -0,0 +1,49 @@
+"""Test finding duplicate sheets."""
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from finder.pylib import dedup
+
+
+class TestDedup(unittest.TestCase):
+    def test_bk_tree_01(self):
+        """It finds hashes within the distance."""
+        tree = dedup.BKTree()
+        for i, hash_ in enumerate([0b0000, 0b0001, 0b0011, 0b0111, 0b1111]):
+            tree.add(hash_, i)
+        self.assertEqual(sorted(tree.find(0b0000, 1)), [0, 1])
+        self.assertEqual(sorted(tree.find(0b0111, 1)), [2, 3, 4])
+
+    def test_bk_tree_02(self):
+        """It keeps items with the same hash."""
+        tree = dedup.BKTree()
+        tree.add(5, "a")
+        tree.add(5, "b")
+        self.assertEqual(sorted(tree.find(5, 0)), ["a", "b"])
+
+    def test_find_duplicates_01(self):
+        """It clusters near duplicates."""
+        hashes = {"c": 0b1111_0000, "a": 0b1111_0001, "b": 0b0000_1111}
+        self.assertEqual(
+            dedup.find_duplicates(hashes, 1), {"a": "a", "b": "b", "c": "a"}
+        )
+
+    def test_find_duplicates_02(self):
+        """It does not chain clusters through intermediate sheets."""
+        hashes = {"a": 0b0000, "b": 0b0001, "c": 0b0011}
+        self.assertEqual(
+            dedup.find_duplicates(hashes, 1), {"a": "a", "b": "a", "c": "c"}
+        )
+
+    def test_image_hash_01(self):
+        """It gives a resized copy nearly the same hash."""
+        rng = np.random.default_rng(42)
+        pixels = rng.integers(0, 256, (40, 30, 3), dtype=np.uint8)
+        image = Image.fromarray(pixels).resize((300, 400))
+        copy = image.resize((150, 200))
+        other = Image.fromarray(rng.integers(0, 256, (400, 300, 3), dtype=np.uint8))
+        hash_ = dedup.image_hash(image)
+        self.assertLessEqual(dedup.distance(hash_, dedup.image_hash(copy)), 10)
+        self.assertGreater(dedup.distance(hash_, dedup.image_hash(other)), 10)
@@ -0,0 +1,60 @@
+"""Test fitting sheet images into a byte budget."""
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+
+from finder.pylib import fit_bytes, sheet_util
+
+
+class TestFitBytes(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.dir = Path(self.temp_dir.name)
+        rng = np.random.default_rng(42)
+        pixels = rng.integers(0, 256, (60, 40, 3), dtype=np.uint8)
+        self.image = Image.fromarray(pixels).resize((400, 600))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def sheet(self, name):
+        path = self.dir / name
+        self.image.save(path)
+        return sheet_util.LazySheet(path)
+
+    def test_fit_to_bytes_01(self):
+        """It does not shrink a sheet that already fits."""
+        sheet = self.sheet("sheet.jpg")
+        fit = fit_bytes.fit_to_bytes(sheet, "JPEG", 10_000_000)
+        self.assertEqual(fit.reduce_by, 1)
+        self.assertEqual(fit.quality, 95)
+
+    def test_fit_to_bytes_02(self):
+        """It shrinks a sheet to fit the budget."""
+        sheet = self.sheet("sheet.jpg")
+        fit = fit_bytes.fit_to_bytes(sheet, "JPEG", 10_000)
+        self.assertLessEqual(len(fit.data), 10_000)
+        self.assertGreater(fit.reduce_by, 1)
+        smaller = fit_bytes.encode_image(
+            sheet.read_reduced(fit.reduce_by - 1), "JPEG", 60
+        )
+        self.assertGreater(len(smaller), 10_000)
+
+    def test_fit_to_bytes_03(self):
+        """It shrinks lossless sheets without a quality."""
+        sheet = self.sheet("sheet.png")
+        fit = fit_bytes.fit_to_bytes(sheet, "PNG", 50_000, min_reduce=2)
+        self.assertLessEqual(len(fit.data), 50_000)
+        self.assertGreaterEqual(fit.reduce_by, 2)
+        self.assertIsNone(fit.quality)
+
+    def test_fit_to_bytes_04(self):
+        """It only decodes a lossless sheet once."""
+        sheet = self.sheet("sheet.png")
+        with mock.patch.object(sheet, "_open", wraps=sheet._open) as opened:
+            fit_bytes.fit_to_bytes(sheet, "PNG", 20_000)
+        self.assertEqual(opened.call_count, 1)
@@ -0,0 +1,64 @@
+"""Test drawing label boxes on sheets."""
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from finder.pylib import overlay
+from finder.pylib.const import OTHER, TYPEWRITTEN
+
+
+class TestOverlay(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.temp_dir.name) / "sheet.png"
+        Image.new("RGB", (400, 600), "white").save(self.path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_render_sheet_01(self):
+        """It scales pixel boxes to the reduced sheet."""
+        boxes = np.array([[40, 60, 200, 300]])
+        image = overlay.render_sheet(
+            self.path, boxes, [TYPEWRITTEN], fractional=False, reduce_by=4
+        )
+        self.assertEqual(image.size, (100, 150))
+        self.assertEqual(image.getpixel((10, 30)), overlay.COLORS[TYPEWRITTEN])
+        self.assertEqual(image.getpixel((30, 40)), (255, 255, 255))
+
+    def test_render_sheet_02(self):
+        """It scales fractional boxes to the reduced sheet."""
+        boxes = np.array([[0.1, 0.1, 0.5, 0.5]])
+        image = overlay.render_sheet(
+            self.path, boxes, [OTHER], fractional=True, reduce_by=2
+        )
+        self.assertEqual(image.size, (200, 300))
+        self.assertEqual(image.getpixel((20, 60)), overlay.COLORS[OTHER])
+
+    def test_render_sheet_03(self):
+        """It skips sheets that are not images."""
+        path = self.path.with_name("bad.png")
+        path.write_text("not an image")
+        self.assertIsNone(
+            overlay.render_sheet(path, np.empty((0, 4)), [], fractional=True)
+        )
+
+    def test_render_sheet_04(self):
+        """It skips sheets whose pixels cannot be decoded."""
+        path = self.path.with_name("truncated.png")
+        path.write_bytes(self.path.read_bytes()[:100])
+        with self.assertLogs(level="ERROR"):
+            image = overlay.render_sheet(
+                path, np.empty((0, 4)), [], fractional=True, reduce_by=2
+            )
+        self.assertIsNone(image)
+
+    def test_mosaic_01(self):
+        """It tiles images into rows with room for captions."""
+        images = [Image.new("RGB", (100, 200)) for _ in range(5)]
+        captions = [f"{i}.jpg" for i in range(5)]
+        sheet = overlay.mosaic(images, captions, 3, 100)
+        self.assertEqual(sheet.size, (150, 2 * (100 + overlay.CAPTION_HEIGHT)))
@@ -0,0 +1,80 @@
+"""Test reconciling only the sheets that changed."""
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from finder.pylib import reconcile
+from finder.pylib.box_store import BoxStoreBuilder
+
+
+class TestReconcile(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.dir = Path(self.temp_dir.name)
+        self.state = self.dir / "state"
+        builder = BoxStoreBuilder()
+        builder.add("a", [[0, 0, 10, 10], [1, 1, 10, 10]], ["Typewritten", "Other"])
+        builder.add("b", [[50, 50, 60, 60]], ["Other"])
+        self.sheets = builder.build()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def digest(self, sheet_id):
+        boxes, classes = self.sheets.get(sheet_id)
+        return reconcile.sheet_digest(boxes, classes, 1, 0.6)
+
+    def label(self, sheet_id, left):
+        return {
+            "sheet": sheet_id,
+            "left": left,
+            "top": "0",
+            "right": "1",
+            "bottom": "1",
+            "class": "Other",
+        }
+
+    def test_update_01(self):
+        """It reuses the labels of sheets whose digest did not change."""
+        old = [self.label("a", "99"), self.label("b", "98")]
+        digests = {"a": self.digest("a"), "b": "changed"}
+        reconcile.write_state(self.state / reconcile.STATE_CSV, old, digests)
+        labels, digests = reconcile.update(self.sheets.items(), self.state, 0.6)
+        self.assertEqual([lb["left"] for lb in labels], ["99", 50])
+        self.assertEqual(digests, {"a": self.digest("a"), "b": self.digest("b")})
+
+    def test_update_02(self):
+        """It reconciles sheets with a matching digest but no saved labels."""
+        state = {"a": (self.digest("a"), []), "b": (self.digest("b"), [])}
+        with mock.patch.object(reconcile, "read_state", return_value=state):
+            labels, _ = reconcile.update(self.sheets.items(), self.state, 0.6)
+        self.assertEqual([lb["sheet"] for lb in labels], ["a", "b"])
+        self.assertEqual(labels[0]["class"], "Typewritten")
+
+    def test_update_03(self):
+        """It drops sheets that are no longer in the export."""
+        old = [self.label("a", "99"), self.label("gone", "1")]
+        digests = {"a": self.digest("a"), "gone": "old"}
+        reconcile.write_state(self.state / reconcile.STATE_CSV, old, digests)
+        labels, digests = reconcile.update(self.sheets.items(), self.state, 0.6)
+        self.assertEqual(sorted({lb["sheet"] for lb in labels}), ["a", "b"])
+        self.assertEqual(sorted(digests), ["a", "b"])
+
+    def test_save_01(self):
+        """It writes the state with the labels' digests."""
+        labels, digests = reconcile.update(self.sheets.items(), self.state, 0.6)
+        reconcile.save(self.dir / "reconciled.csv", labels, self.state, digests)
+        self.assertTrue((self.dir / "reconciled.csv").exists())
+        state = reconcile.read_state(self.state / reconcile.STATE_CSV)
+        self.assertEqual({k: v[0] for k, v in state.items()}, digests)
+
+    def test_save_02(self):
+        """It writes the state after the labels."""
+        calls = mock.Mock()
+        with (
+            mock.patch.object(reconcile, "write_labels", calls.labels),
+            mock.patch.object(reconcile, "write_state", calls.state),
+        ):
+            reconcile.save(self.dir / "reconciled.csv", [], self.state, {})
+        self.assertEqual([c[0] for c in calls.mock_calls], ["labels", "state"])
@@ -0,0 +1,94 @@
+"""Test sheet image utilities."""
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import numpy.testing as npt
+from PIL import Image, TiffImagePlugin
+
+from finder.pylib import sheet_util
+
+
+class TestLazySheet(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.dir = Path(self.temp_dir.name)
+        rng = np.random.default_rng(42)
+        pixels = rng.integers(0, 256, (300, 200, 3), dtype=np.uint8)
+        self.image = Image.fromarray(pixels)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def save_strips(self):
+        path = self.dir / "sheet.tif"
+        old, TiffImagePlugin.WRITE_LIBTIFF = TiffImagePlugin.WRITE_LIBTIFF, True
+        try:
+            self.image.save(path, compression="raw", strip_size=6000)
+        finally:
+            TiffImagePlugin.WRITE_LIBTIFF = old
+        return path
+
+    def test_lazy_sheet_01(self):
+        """It gets the size without decoding the image."""
+        path = self.dir / "sheet.png"
+        self.image.save(path)
+        sheet = sheet_util.LazySheet(path)
+        self.assertEqual(sheet.size, (200, 300))
+        self.assertIsNone(sheet._image)
+
+    def test_lazy_sheet_02(self):
+        """It reads a region from a stripped TIFF."""
+        sheet = sheet_util.LazySheet(self.save_strips())
+        self.assertTrue(sheet.partial)
+        box = (20, 110, 150, 190)
+        npt.assert_array_equal(
+            np.asarray(sheet.read_region(box)), np.asarray(self.image.crop(box))
+        )
+        self.assertIsNone(sheet._image)
+
+    def test_lazy_sheet_03(self):
+        """It pads regions that hang off the edge of a stripped TIFF."""
+        sheet = sheet_util.LazySheet(self.save_strips())
+        box = (-10, 250, 210, 320)
+        npt.assert_array_equal(
+            np.asarray(sheet.read_region(box)), np.asarray(self.image.crop(box))
+        )
+
+    def test_lazy_sheet_04(self):
+        """It falls back to a cached full decode."""
+        path = self.dir / "sheet.png"
+        self.image.save(path)
+        sheet = sheet_util.LazySheet(path)
+        self.assertFalse(sheet.partial)
+        box = (20, 110, 150, 190)
+        npt.assert_array_equal(
+            np.asarray(sheet.read_region(box)), np.asarray(self.image.crop(box))
+        )
+        self.assertIsNotNone(sheet._image)
+
+    def test_lazy_sheet_05(self):
+        """It decodes a JPEG 2000 sheet at a lower resolution level."""
+        path = self.dir / "sheet.jp2"
+        self.image.save(path)
+        sheet = sheet_util.LazySheet(path)
+        self.assertEqual(sheet.read_reduced(4).size, (50, 75))
+
+    def test_lazy_sheet_06(self):
+        """It uses the levels a JPEG 2000 sheet has when asked for more."""
+        path = self.dir / "sheet.jp2"
+        self.image.resize((640, 960)).save(path)  # Pillow writes 5 levels
+        sheet = sheet_util.LazySheet(path)
+        self.assertEqual(sheet.read_reduced(64).size, (10, 15))
+
+    def test_lazy_sheet_07(self):
+        """Compressed TIFFs are decoded whole."""
+        path = self.dir / "sheet.tif"
+        self.image.save(path, compression="tiff_lzw")
+        self.assertFalse(sheet_util.LazySheet(path).partial)
+
+    def test_get_lazy_sheet_01(self):
+        """It handles a missing sheet."""
+        with self.assertLogs(level="ERROR"):
+            self.assertIsNone(sheet_util.get_lazy_sheet(self.dir / "missing.jpg"))
@@ -0,0 +1,121 @@
+"""Test reading and writing files in storage."""
+import importlib.util
+import os
+import tarfile
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from PIL import Image
+
+from finder.pylib import storage
+
+HAS_MOTO = importlib.util.find_spec("moto") is not None
+
+
+class TestStorage(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.dir = Path(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_get_storage_01(self):
+        """It picks the storage by the location."""
+        self.assertIsInstance(storage.get_storage(self.dir), storage.LocalStorage)
+        self.assertIsInstance(
+            storage.get_storage(self.dir / "a.zip"), storage.ZipStorage
+        )
+
+    def test_local_storage_01(self):
+        """It reads and writes files in a directory."""
+        local = storage.LocalStorage(self.dir / "out")
+        local.write("b.txt", b"bee")
+        local.write("a.txt", b"ay")
+        self.assertEqual(local.list(), ["a.txt", "b.txt"])
+        self.assertEqual(local.read("b.txt"), b"bee")
+
+    def test_zip_storage_01(self):
+        """It reads and writes members of a zip archive."""
+        with storage.ZipStorage(self.dir / "sheets.zip") as archive:
+            archive.save_image("a.png", Image.new("RGB", (4, 3)))
+            archive.write("b.txt", b"bee")
+            self.assertEqual(archive.list("*.png"), ["a.png"])
+            self.assertEqual(archive.read("b.txt"), b"bee")
+
+    def test_tar_storage_01(self):
+        """It reads members of a tar archive."""
+        (self.dir / "a.txt").write_bytes(b"ay")
+        path = self.dir / "sheets.tar.gz"
+        with tarfile.open(path, "w:gz") as tar:
+            tar.add(self.dir / "a.txt", "sheets/a.txt")
+        with storage.get_storage(path) as archive:
+            self.assertEqual(archive.list(), ["sheets/a.txt"])
+            self.assertEqual(archive.read("sheets/a.txt"), b"ay")
+
+    def test_prefetch_01(self):
+        """It yields blobs in order."""
+        names = [f"{i}.txt" for i in range(20)]
+        with storage.ZipStorage(self.dir / "files.zip") as archive:
+            for name in names:
+                archive.write(name, name.encode())
+            blobs = list(archive.prefetch(names, workers=3, ahead=4))
+        self.assertEqual([b.key for b in blobs], names)
+        self.assertEqual([b.data for b in blobs], [n.encode() for n in names])
+
+    def test_prefetch_02(self):
+        """It does not read local files up front."""
+        local = storage.LocalStorage(self.dir)
+        local.write("a.txt", b"ay")
+        blobs = list(local.prefetch(["a.txt"]))
+        self.assertIsNone(blobs[0].data)
+        self.assertEqual(blobs[0].path, self.dir / "a.txt")
+        with blobs[0].open() as file:
+            self.assertEqual(file.read(), b"ay")
+
+    def test_prefetch_03(self):
+        """It skips files that cannot be read."""
+        with storage.ZipStorage(self.dir / "files.zip") as archive:
+            archive.write("a.txt", b"ay")
+            archive.write("c.txt", b"see")
+            with self.assertLogs(level="WARNING"):
+                blobs = list(archive.prefetch(["a.txt", "b.txt", "c.txt"]))
+        self.assertEqual([b.key for b in blobs], ["a.txt", "c.txt"])
+
+    @unittest.skipUnless(HAS_MOTO, "moto is not installed")
+    @mock.patch.dict(
+        os.environ,
+        {
+            "AWS_ACCESS_KEY_ID": "testing",
+            "AWS_SECRET_ACCESS_KEY": "testing",
+            "AWS_DEFAULT_REGION": "us-east-1",
+        },
+    )
+    def test_s3_storage_01(self):
+        """It reads ranges and uploads objects to an S3 compatible server."""
+        from moto.server import ThreadedMotoServer  # noqa: PLC0415
+
+        server = ThreadedMotoServer(port=0)
+        server.start()
+        try:
+            host, port = server.get_host_and_port()
+            s3 = storage.S3Storage(
+                "sheets", "run", endpoint_url=f"http://{host}:{port}", workers=2
+            )
+            s3.client.create_bucket(Bucket="sheets")
+
+            data = bytes(range(256)) * 100
+            with s3:
+                s3.write("a.bin", data)
+                s3.write("b.txt", b"bee")
+
+            old, storage.CHUNK_SIZE = storage.CHUNK_SIZE, 1000
+            try:
+                self.assertEqual(s3.list("*.bin"), ["a.bin"])
+                self.assertEqual(s3.read("a.bin"), data)
+            finally:
+                storage.CHUNK_SIZE = old
+        finally:
+            server.stop()
@@ -0,0 +1,134 @@
+"""Test cutting sheets into tiles and merging the tile results."""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from finder.pylib import sheet_util, storage, tiling
+
+
+class TestTiling(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.dir = Path(self.temp_dir.name)
+        rng = np.random.default_rng(42)
+        pixels = rng.integers(0, 256, (250, 300, 3), dtype=np.uint8)
+        self.image = Image.fromarray(pixels)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_tile_starts_01(self):
+        """It overlaps the tiles and ends flush with the edge."""
+        self.assertEqual(tiling.tile_starts(300, 128, 32), [0, 96, 172])
+
+    def test_tile_starts_02(self):
+        """It uses one tile for short sides."""
+        self.assertEqual(tiling.tile_starts(100, 128, 32), [0])
+
+    def test_sheet_tiles_01(self):
+        """It cuts a stripped TIFF into tiles that match the sheet."""
+        path = self.dir / "sheet.tif"
+        self.image.save(path, rows_per_strip=16)
+        sheet = sheet_util.LazySheet(path)
+        self.assertTrue(sheet.partial)
+
+        tiles = list(tiling.sheet_tiles(sheet, 128, 32))
+        self.assertEqual(len(tiles), 9)
+        for left, top, tile in tiles:
+            expect = self.image.crop((left, top, left + 128, top + 128))
+            self.assertEqual(tile.tobytes(), expect.tobytes())
+
+    def test_sheet_tiles_02(self):
+        """It pads tiles that are bigger than the sheet."""
+        path = self.dir / "sheet.png"
+        self.image.save(path)
+        tiles = list(tiling.sheet_tiles(sheet_util.LazySheet(path), 400, 32))
+        self.assertEqual(len(tiles), 1)
+        self.assertEqual(tiles[0][2].size, (400, 400))
+        self.assertEqual(tiles[0][2].getpixel((350, 350)), (0, 0, 0))
+
+    def test_from_tile_01(self):
+        """It moves a tile box into sheet coordinates."""
+        tile = {"left": 96, "top": 0, "tile_size": 128, "width": 300, "height": 250}
+        cls, box, conf = tiling.from_tile("1 0.5 0.25 0.25 0.5 0.9", tile)
+        self.assertEqual((cls, box, conf), (1, [144.0, 0.0, 176.0, 64.0], 0.9))
+
+    def test_open_index_01(self):
+        """It writes tile index rows that read back as numbers."""
+        path = self.dir / "sheet.png"
+        self.image.save(path)
+        with storage.LocalStorage(self.dir / "tiles") as yolo_images:
+            rows = tiling.to_yolo_tiles(path, yolo_images, 128, 32)
+        with tiling.open_index(self.dir / "index.csv") as index:
+            index.writerows(rows)
+        tiles = tiling.read_index(self.dir / "index.csv")
+        self.assertEqual(list(tiles.values()), rows)
+
+    def test_read_tile_results_01(self):
+        """It skips sheets whose result files are all empty."""
+        tile = {"left": 0, "top": 0, "tile_size": 128, "width": 300, "height": 250}
+        tiles = {
+            "a_0_0": {"tile": "a_0_0", "sheet": "a.jpg"} | tile,
+            "b_0_0": {"tile": "b_0_0", "sheet": "b.jpg"} | tile,
+        }
+        (self.dir / "a_0_0.txt").write_text("1 0.5 0.5 0.25 0.25 0.9\n")
+        (self.dir / "b_0_0.txt").write_text("")
+        sheets = tiling.read_tile_results(tiles, self.dir)
+        self.assertEqual(list(sheets), ["a.jpg"])
+        self.assertEqual(sheets["a.jpg"][0][1], [48.0, 48.0, 80.0, 80.0])
+
+    def test_merge_tile_boxes_01(self):
+        """It merges a label cut by a tile edge with its whole copy."""
+        boxes = np.array(
+            [[90.0, 10.0, 128.0, 40.0], [90.0, 10.0, 150.0, 40.0], [0, 0, 20, 20]]
+        )
+        classes = np.array([0, 1, 0])
+        confs = np.array([0.5, 0.8, 0.7])
+        regions = np.array([[0, 0, 128, 128], [64, 0, 192, 128], [0, 0, 128, 128]])
+        boxes, classes, confs = tiling.merge_tile_boxes(
+            boxes, classes, confs, regions, 0.5
+        )
+        self.assertEqual(boxes.tolist(), [[90.0, 10.0, 150.0, 40.0], [0, 0, 20, 20]])
+        self.assertEqual(classes.tolist(), [1, 0])
+        self.assertEqual(confs.tolist(), [0.8, 0.7])
+
+    def test_merge_tile_boxes_02(self):
+        """It joins the pieces of a label wider than the tile overlap."""
+        tiles = [
+            {"left": x, "top": 0, "tile_size": 640, "width": 2000, "height": 640}
+            for x in tiling.tile_starts(2000, 640, 128)
+        ]
+        label = [300.0, 100.0, 1300.0, 200.0]
+
+        found = []
+        for tile in tiles:
+            region = tiling.tile_region(tile)
+            piece = [
+                max(label[0], region[0]),
+                label[1],
+                min(label[2], region[2]),
+                label[3],
+            ]
+            if piece[0] < piece[2]:
+                found.append((piece, region))
+        self.assertEqual(len(found), 3)
+
+        boxes = np.array([f[0] for f in found])
+        regions = np.array([f[1] for f in found])
+        merged, _, _ = tiling.merge_tile_boxes(
+            boxes, np.ones(3, dtype=int), np.ones(3), regions, 0.5
+        )
+        self.assertEqual(merged.tolist(), [label])
+
+    def test_merge_tile_boxes_03(self):
+        """It keeps labels apart that only share a tile overlap."""
+        boxes = np.array([[520.0, 100.0, 600.0, 150.0], [560.0, 160.0, 630.0, 220.0]])
+        regions = np.array([[0, 0, 640, 640], [512, 0, 1152, 640]])
+        merged, _, _ = tiling.merge_tile_boxes(
+            boxes, np.zeros(2, dtype=int), np.ones(2), regions, 0.5
+        )
+        self.assertEqual(len(merged), 2)
@@ -0,0 +1,92 @@
+"""Test watching for new sheets."""
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from finder.pylib.watcher import DirWatcher, ServiceStats
+
+
+class TestDirWatcher(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.dir = Path(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_scan_01(self):
+        """It waits for a file to stop changing."""
+        watcher = DirWatcher(self.dir, settle=2.0)
+        path = self.dir / "a.jpg"
+        path.write_bytes(b"part")
+        self.assertEqual(watcher.scan(now=0.0), [])
+
+        path.write_bytes(b"partial")
+        self.assertEqual(watcher.scan(now=1.0), [])
+        self.assertEqual(watcher.scan(now=2.0), [])
+        self.assertEqual([p for p, _ in watcher.scan(now=3.0)], [path])
+
+    def test_scan_02(self):
+        """It only returns a file once."""
+        watcher = DirWatcher(self.dir, settle=0.0)
+        (self.dir / "a.jpg").write_bytes(b"sheet")
+        watcher.scan(now=0.0)
+        self.assertEqual(len(watcher.scan(now=1.0)), 1)
+        self.assertEqual(watcher.scan(now=2.0), [])
+
+    def test_scan_03(self):
+        """It skips temporary, hidden, and unmatched files."""
+        watcher = DirWatcher(self.dir, "*.txt", settle=0.0)
+        for name in ("a.txt.part", ".b.txt", "c.jpg", "d.txt"):
+            (self.dir / name).write_bytes(b"data")
+        watcher.scan(now=0.0)
+        self.assertEqual([p.name for p, _ in watcher.scan(now=1.0)], ["d.txt"])
+
+    def test_scan_04(self):
+        """It returns a file again after it is replaced."""
+        watcher = DirWatcher(self.dir, settle=0.0)
+        path = self.dir / "a.jpg"
+        path.write_bytes(b"sheet")
+        watcher.scan(now=0.0)
+        watcher.scan(now=1.0)
+        path.write_bytes(b"new sheet")
+        os.utime(path, (time.time() + 10, time.time() + 10))
+        watcher.scan(now=2.0)
+        self.assertEqual(len(watcher.scan(now=3.0)), 1)
+
+    def test_scan_05(self):
+        """It skips reading an idle directory."""
+        watcher = DirWatcher(self.dir, settle=0.0)
+        (self.dir / "a.jpg").write_bytes(b"sheet")
+        os.utime(self.dir, (time.time() - 10, time.time() - 10))
+        watcher.scan(now=0.0)
+        self.assertEqual(len(watcher.scan(now=1.0)), 1)
+        watcher.done.clear()  # A full scan would see a.jpg as new
+        self.assertEqual(watcher.scan(now=2.0), [])
+        self.assertEqual(watcher.pending, {})
+
+    def test_seed_01(self):
+        """It does not return seeded files."""
+        (self.dir / "a.jpg").write_bytes(b"sheet")
+        (self.dir / "b.jpg").write_bytes(b"sheet")
+        watcher = DirWatcher(self.dir, settle=0.0)
+        watcher.seed(["a.jpg", "missing.jpg"])
+        watcher.scan(now=0.0)
+        self.assertEqual([p.name for p, _ in watcher.scan(now=1.0)], ["b.jpg"])
+
+
+class TestServiceStats(unittest.TestCase):
+    def test_stats_01(self):
+        """It counts queued, processed, and failed items."""
+        stats = ServiceStats()
+        stats.add(3)
+        now = time.time()
+        stats.finish(now - 2.0)
+        stats.finish(now - 1.0, ok=False)
+        result = stats.to_dict()
+        self.assertEqual(result["queue_depth"], 1)
+        self.assertEqual(result["processed"], 1)
+        self.assertEqual(result["failed"], 1)
+        self.assertGreaterEqual(result["latency_max"], 2.0)
@@ -0,0 +1,86 @@
+"""Test reading raw Zooniverse classification exports."""
+
+import csv
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from finder.pylib import zooniverse
+from finder.pylib.const import OTHER, TYPEWRITTEN
+
+
+def export_row(classification_id, workflow_id, file_name, marks):
+    return {
+        "classification_id": classification_id,
+        "workflow_id": workflow_id,
+        "annotations": json.dumps([{"task": "T0", "value": marks}]),
+        "subject_data": json.dumps({"99": {"retired": None, "Filename": file_name}}),
+    }
+
+
+class TestZooniverse(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.export = Path(self.temp_dir.name) / "export.csv"
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write(self, rows):
+        with self.export.open("w") as out:
+            writer = csv.DictWriter(out, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+    def test_read_classifications_01(self):
+        """It gets boxes and classes from the rectangle marks."""
+        self.write(
+            [
+                export_row(
+                    "1",
+                    "7",
+                    "a.jpg",
+                    [
+                        {"x": 10, "y": 20, "width": 30, "height": 40, "tool_label": ""},
+                        {
+                            "x": 50,
+                            "y": 60,
+                            "width": -10,
+                            "height": 5,
+                            "details": [{"value": "Typewritten"}],
+                        },
+                        {"x": 1, "y": 2},
+                    ],
+                )
+            ]
+        )
+        found = list(zooniverse.read_classifications(self.export))
+        self.assertEqual(len(found), 1)
+        self.assertEqual(found[0].sheet_id, "a.jpg")
+        self.assertEqual(found[0].boxes, [[10, 20, 40, 60], [40, 60, 50, 65]])
+        self.assertEqual(found[0].classes, [OTHER, TYPEWRITTEN])
+
+    def test_read_classifications_02(self):
+        """It skips other workflows."""
+        mark = {"x": 1, "y": 2, "width": 3, "height": 4, "tool_label": "Typed"}
+        self.write(
+            [export_row("1", "7", "a.jpg", [mark]), export_row("2", "8", "b.jpg", [])]
+        )
+        found = list(
+            zooniverse.read_classifications(
+                self.export, workflow_id="7", typewritten=("Typed",)
+            )
+        )
+        self.assertEqual([c.classification_id for c in found], ["1"])
+        self.assertEqual(found[0].classes, [TYPEWRITTEN])
+
+    def test_read_classifications_03(self):
+        """It matches answers that are numbers."""
+        marks = [
+            {"x": 1, "y": 2, "width": 3, "height": 4, "details": [{"value": 1}]},
+            {"x": 1, "y": 2, "width": 3, "height": 4, "details": [{"value": [0]}]},
+        ]
+        self.write([export_row("1", "7", "a.jpg", marks)])
+        found = list(zooniverse.read_classifications(self.export, typewritten=("1",)))
+        self.assertEqual(found[0].classes, [TYPEWRITTEN, OTHER])